@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import time
+
+HOST = "localhost"  # The server's hostname or IP address
+PORT = 65432  # The port used by the server
+
+COMMANDS = ["time", "date", "month", "day", "year", "hour", "minutes", "seconds"]
+
+
+async def client(depth, deadline, counts):
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    # depth commands per round trip (1 = no pipelining)
+    batch = "".join(f"{COMMANDS[i % len(COMMANDS)]}\n" for i in range(depth)).encode()
+    done = 0
+    while time.perf_counter() < deadline:
+        writer.write(batch)
+        for _ in range(depth):
+            await reader.readline()
+        done += depth
+    counts.append(done)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(clients, depth, duration):
+    counts = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(depth, deadline, counts) for _ in range(clients)))
+    return sum(counts) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/s of the command server")
+    parser.add_argument("-c", "--clients", default="1,10,100")
+    parser.add_argument("-p", "--pipeline", default="1,16")
+    parser.add_argument("-d", "--duration", type=float, default=5)
+    args = parser.parse_args()
+    print(f"{'clients':>8} {'pipeline':>9} {'requests/s':>12}")
+    for clients in [int(c) for c in args.clients.split(",")]:
+        for depth in [int(p) for p in args.pipeline.split(",")]:
+            rate = asyncio.run(run(clients, depth, args.duration))
+            print(f"{clients:>8} {depth:>9} {rate:>12.0f}")
+
+
+main()
@@ -6,12 +6,17 @@ PORT = 65432  # The port used by the server
 
 with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
     s.connect((HOST, PORT))
+    f = s.makefile("r")
     while True:
         command = input(
-            "Enter command (help, time, date, month, day, year, hour, minutes, seconds): "
+            "Enter commands (help, time, date, month, day, year, hour, minutes, seconds): "
         )
         if command.lower() == "quit":
             break
-        s.sendall(command.encode())
-        data = s.recv(1024).decode()
-        print(data)
+        # one command per line, all sent in a single round trip
+        commands = command.split()
+        if not commands:
+            continue
+        s.sendall("".join(f"{c}\n" for c in commands).encode())
+        for _ in commands:
+            print(f.readline(), end="")
@@ -1,5 +1,5 @@
+import asyncio
 import datetime
-import socket
 
 HOST = "localhost"  # Standard loopback interface address (localhost)
 PORT = 65432  # Port to listen on (non-privileged ports are > 1023)
@@ -57,28 +57,55 @@ def get_current_seconds():
     return now.second
 
 
-def handle_client(conn, addr):
-    print(f"Connected by {addr}")
-    while True:
-        data = conn.recv(1024).decode()
-        if not data:
+def get_help():
+    # one response per line: the help is a single line too
+    return " | ".join(f"{cmd}: {desc}" for cmd, desc in commands.items())
+
+
+handlers = {
+    "help": get_help,
+    "time": get_current_time,
+    "date": get_current_date,
+    "month": get_current_month,
+    "day": get_current_day,
+    "year": get_current_year,
+    "hour": get_current_hour,
+    "minutes": get_current_minutes,
+    "seconds": get_current_seconds,
+}
+
+MAX_LINE = 1024  # Longest command accepted (bytes)
+
+
+def execute(line):
+    command = line.decode(errors="replace").strip().lower()
+    handler = handlers.get(command)
+    if handler is None:
+        response = f"Invalid command: '{command}'"
+    else:
+        response = str(handler())
+    return f"{response}\n".encode()
+
+
+async def handle_client(reader, writer):
+    print(f"Connected by {writer.get_extra_info('peername')}")
+    pending = b""
+    # newline-delimited commands: a client can send many before reading the answers
+    while data := await reader.read(65536):
+        *lines, pending = (pending + data).split(b"\n")
+        if len(pending) > MAX_LINE:
             break
-        command = data.strip().lower()
-        if command == "help":
-            response = "\n".join(f"{cmd}: {desc}" for cmd, desc in commands.items())
-        elif command in commands:
-            func = globals()[f"get_current_{command}"]
-            response = str(func())
-        else:
-            response = f"Invalid command: '{command}'"
-        conn.sendall(response.encode())
-    conn.close()
-
-
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-    s.bind((HOST, PORT))
-    s.listen()
+        # one write for all the commands received together
+        writer.write(b"".join(execute(line) for line in lines if line.strip()))
+        await writer.drain()
+    writer.close()
+
+
+async def main():
+    server = await asyncio.start_server(handle_client, HOST, PORT)
     print(f"Server listening on port {PORT}")
-    while True:
-        conn, addr = s.accept()
-        handle_client(conn, addr)
+    async with server:
+        await server.serve_forever()
+
+
+asyncio.run(main())
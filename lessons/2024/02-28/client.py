@@ -1,7 +1,7 @@
-import json
 import socket
 from threading import Lock, Thread
 
+from codec import TAGS, available, decode
 from data import server_addr
 from utils import manage_exception
 
@@ -14,7 +14,9 @@ def main():
         s = socket.socket(family=socket.AF_INET, type=socket.SOCK_STREAM, proto=0)
         s.connect(server_addr)
         name = input("Name: ")
-        s.send(name.encode())
+        # hello: the name and the codecs known here, the server answers the chosen one
+        s.send(f"{name}\n{','.join(available())}".encode())
+        print(f"Codec: {TAGS[s.recv(1)]}")
         Thread(
             target=recv_manager,
             kwargs={"sock": s},
@@ -37,9 +39,9 @@ def main():
 
 def recv_manager(sock):
     while True:
-        d = json.loads(sock.recv(10000).decode())
+        d = decode(sock.recv(10000))
         lock.acquire()
-        print(f"{d['name']} >", d["msg"])
+        print(f"{d['name']} >", d["message"])
         lock.release()
 
 
@@ -0,0 +1,83 @@
+import json
+from struct import Struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# envelope: {"name": str, "type": str, "message": str, "time": epoch millis}
+
+# binary layout: time (int64 ms), type length (uint8), name length (uint16),
+# message length (uint32), then type, name and message in UTF-8
+BINARY_HEADER = Struct("!qBHI")
+
+
+def encode_json(envelope):
+    return json.dumps(envelope, separators=(",", ":")).encode()
+
+
+def decode_json(data):
+    return json.loads(data)
+
+
+def encode_msgpack(envelope):
+    return msgpack.packb(envelope)
+
+
+def decode_msgpack(data):
+    return msgpack.unpackb(data)
+
+
+def encode_binary(envelope):
+    type = envelope["type"].encode()
+    name = envelope["name"].encode()
+    message = envelope["message"].encode()
+    header = BINARY_HEADER.pack(envelope["time"], len(type), len(name), len(message))
+    return b"".join((header, type, name, message))
+
+
+def decode_binary(data):
+    time, t, n, m = BINARY_HEADER.unpack_from(data)
+    t += BINARY_HEADER.size
+    n += t
+    return {
+        "name": data[t:n].decode(),
+        "type": data[BINARY_HEADER.size : t].decode(),
+        "message": data[n : n + m].decode(),
+        "time": time,
+    }
+
+
+# name -> (tag byte, encoder, decoder), in order of preference
+CODECS = {
+    "binary": (b"b", encode_binary, decode_binary),
+    "msgpack": (b"m", encode_msgpack, decode_msgpack),
+    "json": (b"j", encode_json, decode_json),
+}
+if msgpack is None:
+    del CODECS["msgpack"]
+
+TAGS = {tag: name for name, (tag, _, _) in CODECS.items()}
+
+
+def available():
+    return list(CODECS)
+
+
+def negotiate(offered):
+    # the first codec of the offer known here, JSON as the common fallback
+    return next((c for c in offered if c in CODECS), "json")
+
+
+def encode(codec, envelope):
+    # tagged: the first byte names the codec so any peer can decode it
+    tag, encoder, _ = CODECS[codec]
+    return tag + encoder(envelope)
+
+
+def decode(data):
+    name = TAGS.get(data[:1])
+    if name is None:
+        raise ValueError(f"Unknown codec tag {data[:1]!r}")
+    return CODECS[name][2](data[1:])
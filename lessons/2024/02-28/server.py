@@ -1,8 +1,9 @@
-import json
 import socket
 import sys
+import time
 from threading import Thread
 
+from codec import CODECS, encode, negotiate
 from data import server_addr
 
 clients = {}
@@ -17,10 +18,13 @@ def main():
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         while True:
             c_sock, c_addr = s.accept()
-            clients[c_addr] = c_sock
 
-            c_name = c_sock.recv(200).decode()
-            print(f"{c_name} joins the chat")
+            # hello: the name, then the codecs of the client in order of preference
+            c_name, _, c_codecs = c_sock.recv(200).decode().partition("\n")
+            c_codec = negotiate(c_codecs.split(","))
+            c_sock.send(CODECS[c_codec][0])
+            clients[c_addr] = (c_sock, c_codec)
+            print(f"{c_name} joins the chat ({c_codec})")
             Thread(
                 target=client_manager,
                 kwargs={"name": c_name, "sock": c_sock, "addr": c_addr},
@@ -38,10 +42,19 @@ def client_manager(name, sock, addr):
         msg = sock.recv(200).decode()
         if msg != "end":
             print(f"{name} >", msg)
-        for c_addr, c_sock in clients.items():
+        envelope = {
+            "name": name,
+            "type": ">",
+            "message": msg,
+            "time": int(time.time() * 1000),
+        }
+        # serialize once per codec, the same bytes are sent to the clients using it
+        data = {}
+        for c_addr, (c_sock, c_codec) in clients.items():
             if c_addr != addr:
-                d = {"name": name, "msg": msg}
-                c_sock.send(json.dumps(d).encode())
+                if c_codec not in data:
+                    data[c_codec] = encode(c_codec, envelope)
+                c_sock.send(data[c_codec])
     print(f"{name} leaves the chat")
     sock.close()
 
@@ -0,0 +1,98 @@
+"""
+Benchmark of full vs. resumed TLS handshakes per second against server.py,
+started first with python server.py PORT. The client has the settings of
+client.py and a handshake counts as resumed when OpenSSL reports it
+"""
+
+import argparse
+import os
+import socket
+import sys
+import time
+
+from OpenSSL import SSL
+from OpenSSL._util import lib as _lib
+
+VERSIONS = {"1.2": SSL.TLS1_2_VERSION, "1.3": SSL.TLS1_3_VERSION}
+
+dir = os.path.dirname(sys.argv[0])
+if dir == "":
+    dir = os.curdir
+
+
+def verify_cb(conn, cert, errnum, depth, ok):
+    return ok
+
+
+def session_reused(conn):
+    # SSL_session_reused() of OpenSSL: pyOpenSSL has no public wrapper
+    return bool(_lib.SSL_session_reused(conn._ssl))
+
+
+def client_context(version):
+    # the same settings as client.py
+    ctx = SSL.Context(SSL.SSLv23_METHOD)
+    ctx.set_verify(SSL.VERIFY_PEER, verify_cb)
+    ctx.set_cipher_list(b"ALL:@SECLEVEL=0")
+    ctx.use_privatekey_file(os.path.join(dir, "keys/client.pkey"))
+    ctx.use_certificate_file(os.path.join(dir, "keys/client.cert"))
+    ctx.load_verify_locations(os.path.join(dir, "keys/CA.cert"))
+    ctx.set_session_cache_mode(SSL.SESS_CACHE_CLIENT)
+    ctx.set_max_proto_version(version)
+    return ctx
+
+
+def handshake(ctx, address, session=None):
+    # returns the seconds of the handshake alone, the session and whether
+    # the server resumed it
+    sock = SSL.Connection(ctx, socket.socket(socket.AF_INET, socket.SOCK_STREAM))
+    if session is not None:
+        sock.set_session(session)
+    start = time.perf_counter()
+    sock.connect(address)
+    sock.do_handshake()
+    elapsed = time.perf_counter() - start
+    # TLS 1.3 tickets arrive after the handshake: an echo reads them
+    sock.send(b"\n")
+    sock.recv(1024)
+    reused = session_reused(sock)
+    session = sock.get_session()
+    # a session is resumable only if its connection was shut down properly
+    sock.shutdown()
+    sock.close()
+    return elapsed, session, reused
+
+
+def run(version, address, count):
+    ctx = client_context(VERSIONS[version])
+    full = 0
+    for _ in range(count):
+        elapsed, session, _ = handshake(ctx, address)
+        full += elapsed
+    resumed = 0
+    reused = 0
+    for _ in range(count):
+        elapsed, session, resumption = handshake(ctx, address, session)
+        resumed += elapsed
+        reused += resumption
+    return count / full, count / resumed, reused
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("host")
+    parser.add_argument("port", type=int)
+    parser.add_argument("-n", "--handshakes", type=int, default=200)
+    args = parser.parse_args()
+    address = (args.host, args.port)
+    print(f"{'TLS':<4} {'full/s':>8} {'resumed/s':>10} {'speedup':>8} {'resumed':>8}")
+    for version in VERSIONS:
+        full, resumed, reused = run(version, address, args.handshakes)
+        print(
+            f"{version:<4} {full:>8.0f} {resumed:>10.0f} {resumed / full:>7.1f}x "
+            f"{reused:>4}/{args.handshakes}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,31 +8,41 @@
 Certificate generation module.
 """
 
+from cryptography.hazmat.primitives.asymmetric import ec
 from OpenSSL import crypto
 
 TYPE_RSA = crypto.TYPE_RSA
 TYPE_DSA = crypto.TYPE_DSA
+TYPE_EC = crypto.TYPE_EC
+
+# curves of the EC keys, by number of bits
+CURVES = {256: ec.SECP256R1, 384: ec.SECP384R1, 521: ec.SECP521R1}
 
 
 def createKeyPair(type, bits):
     """
     Create a public/private key pair.
 
-    Arguments: type - Key type, must be one of TYPE_RSA and TYPE_DSA
-               bits - Number of bits to use in the key
+    Arguments: type - Key type, must be one of TYPE_RSA, TYPE_DSA and TYPE_EC
+               bits - Number of bits to use in the key (256, 384 or 521 for
+                      TYPE_EC: the NIST P curves)
     Returns:   The public/private key pair in a PKey object
     """
+    if type == TYPE_EC:
+        return crypto.PKey.from_cryptography_key(
+            ec.generate_private_key(CURVES[bits]())
+        )
     pkey = crypto.PKey()
     pkey.generate_key(type, bits)
     return pkey
 
 
-def createCertRequest(pkey, digest="md5", **name):
+def createCertRequest(pkey, digest="sha256", **name):
     """
     Create a certificate request.
 
     Arguments: pkey   - The key to associate with the request
-               digest - Digestion method to use for signing, default is md5
+               digest - Digestion method to use for signing, default is sha256
                **name - The name of the subject of the request, possible
                         arguments are:
                           C     - Country name
@@ -55,7 +65,9 @@ def createCertRequest(pkey, digest="md5", **name):
     return req
 
 
-def createCertificate(req, xxx_todo_changeme, serial, xxx_todo_changeme1, digest="md5"):
+def createCertificate(
+    req, xxx_todo_changeme, serial, xxx_todo_changeme1, digest="sha256"
+):
     """
     Generate a certificate given a certificate request.
 
@@ -67,7 +79,7 @@ def createCertificate(req, xxx_todo_changeme, serial, xxx_todo_changeme1, digest
                             starts being valid
                notAfter   - Timestamp (relative to now) when the certificate
                             stops being valid
-               digest     - Digest method to use for signing, default is md5
+               digest     - Digest method to use for signing, default is sha256
     Returns:   The signed certificate in an X509 object
     """
     (issuerCert, issuerKey) = xxx_todo_changeme
@@ -14,6 +14,7 @@ import socket
 import sys
 
 from OpenSSL import SSL
+from OpenSSL._util import lib as _lib
 
 
 def verify_cb(conn, cert, errnum, depth, ok):
@@ -22,6 +23,22 @@ def verify_cb(conn, cert, errnum, depth, ok):
     return ok
 
 
+def session_reused(conn):
+    # SSL_session_reused() of OpenSSL: pyOpenSSL has no public wrapper
+    return bool(_lib.SSL_session_reused(conn._ssl))
+
+
+def connect(session=None):
+    sock = SSL.Connection(ctx, socket.socket(socket.AF_INET, socket.SOCK_STREAM))
+    if session is not None:
+        sock.set_session(session)
+    sock.connect((sys.argv[1], int(sys.argv[2])))
+    sock.do_handshake()
+    if session_reused(sock):
+        print("Session resumed")
+    return sock
+
+
 if len(sys.argv) < 3:
     print("Usage: python client.py HOST PORT")
     sys.exit(1)
@@ -33,22 +50,29 @@ if dir == "":
 # Initialize context
 ctx = SSL.Context(SSL.SSLv23_METHOD)
 ctx.set_verify(SSL.VERIFY_PEER, verify_cb)  # Demand a certificate
-ctx.set_ciphers("ALL:@SECLEVEL=0")
+ctx.set_cipher_list(b"ALL:@SECLEVEL=0")
 ctx.use_privatekey_file(os.path.join(dir, "keys/client.pkey"))
 ctx.use_certificate_file(os.path.join(dir, "keys/client.cert"))
 ctx.load_verify_locations(os.path.join(dir, "keys/CA.cert"))
+ctx.set_session_cache_mode(SSL.SESS_CACHE_CLIENT)
 
 # Set up client
-sock = SSL.Connection(ctx, socket.socket(socket.AF_INET, socket.SOCK_STREAM))
-sock.connect((sys.argv[1], int(sys.argv[2])))
+sock = connect()
 
 while 1:
     line = sys.stdin.readline()
     if line == "":
         break
+    if line.strip() == "reconnect":
+        # close properly (or the session is not resumable) and resume it
+        session = sock.get_session()
+        sock.shutdown()
+        sock.close()
+        sock = connect(session)
+        continue
     try:
-        sock.send(line)
-        sys.stdout.write(sock.recv(1024))
+        sock.send(line.encode())
+        sys.stdout.write(sock.recv(1024).decode())
         sys.stdout.flush()
     except SSL.Error:
         print("Connection died unexpectedly")
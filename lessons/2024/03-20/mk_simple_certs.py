@@ -2,25 +2,86 @@
 Create certificates and private keys for the 'simple' example.
 """
 
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 from certgen import *  # yes yes, I know, I'm lazy
 from OpenSSL import crypto
 
-cakey = createKeyPair(TYPE_RSA, 2048)
-careq = createCertRequest(cakey, CN="Certificate Authority")
-cacert = createCertificate(
-    careq, (careq, cakey), 0, (0, 60 * 60 * 24 * 365 * 5)
-)  # five years
-open("keys/CA.pkey", "wb").write(crypto.dump_privatekey(crypto.FILETYPE_PEM, cakey))
-open("keys/CA.cert", "wb").write(crypto.dump_certificate(crypto.FILETYPE_PEM, cacert))
-for fname, cname in [("client", "Simple Client"), ("server", "Simple Server")]:
-    pkey = createKeyPair(TYPE_RSA, 2048)
+FIVE_YEARS = 60 * 60 * 24 * 365 * 5
+KEY_TYPES = {"ec": (TYPE_EC, 256), "rsa": (TYPE_RSA, 2048)}
+
+# CA of the batch, loaded once by each worker process
+ca = None
+
+
+def write(fname, pkey, cert):
+    open(f"{fname}.pkey", "wb").write(crypto.dump_privatekey(crypto.FILETYPE_PEM, pkey))
+    open(f"{fname}.cert", "wb").write(crypto.dump_certificate(crypto.FILETYPE_PEM, cert))
+
+
+def mkCert(cname, issuer, serial, key_type):
+    pkey = createKeyPair(*KEY_TYPES[key_type])
     req = createCertRequest(pkey, CN=cname)
-    cert = createCertificate(
-        req, (cacert, cakey), 1, (0, 60 * 60 * 24 * 365 * 5)
-    )  # five years
-    open("keys/%s.pkey" % (fname,), "wb").write(
-        crypto.dump_privatekey(crypto.FILETYPE_PEM, pkey)
+    cert = createCertificate(req, issuer, serial, (0, FIVE_YEARS))
+    return pkey, cert
+
+
+def loadCA(cacert, cakey):
+    global ca
+    ca = (
+        crypto.load_certificate(crypto.FILETYPE_PEM, cacert),
+        crypto.load_privatekey(crypto.FILETYPE_PEM, cakey),
     )
-    open("keys/%s.cert" % (fname,), "wb").write(
-        crypto.dump_certificate(crypto.FILETYPE_PEM, cert)
+
+
+def mkClient(i, directory, key_type):
+    # serials 0 and 1 are the CA and the simple client/server
+    fname = os.path.join(directory, f"client-{i:05d}")
+    write(fname, *mkCert(f"Client {i}", ca, i + 2, key_type))
+    return fname
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-t",
+        "--type",
+        choices=KEY_TYPES,
+        default="rsa",
+        help="key type: rsa (2048 bits, default) or ec (P-256, faster handshakes)",
+    )
+    parser.add_argument(
+        "-n", "--clients", type=int, default=0, help="client identities to generate"
     )
+    parser.add_argument("-d", "--directory", default="keys/clients")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.clients == 0:
+        cakey = createKeyPair(*KEY_TYPES[args.type])
+        careq = createCertRequest(cakey, CN="Certificate Authority")
+        cacert = createCertificate(careq, (careq, cakey), 0, (0, FIVE_YEARS))
+        write("keys/CA", cakey, cacert)
+        for fname, cname in [("client", "Simple Client"), ("server", "Simple Server")]:
+            write(f"keys/{fname}", *mkCert(cname, (cacert, cakey), 1, args.type))
+        return
+
+    # batch: many clients signed by the existing CA, one process per core
+    os.makedirs(args.directory, exist_ok=True)
+    ca_pem = (open("keys/CA.cert", "rb").read(), open("keys/CA.pkey", "rb").read())
+    with ProcessPoolExecutor(args.workers, initializer=loadCA, initargs=ca_pem) as pool:
+        done = pool.map(
+            mkClient,
+            range(args.clients),
+            [args.directory] * args.clients,
+            [args.type] * args.clients,
+            chunksize=max(1, args.clients // (args.workers * 4)),
+        )
+        n = sum(1 for _ in done)
+    print(f"{n} client certificates written to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -40,6 +40,12 @@ ctx.set_verify(
 ctx.use_privatekey_file(os.path.join(dir, "keys/server.pkey"))
 ctx.use_certificate_file(os.path.join(dir, "keys/server.cert"))
 ctx.load_verify_locations(os.path.join(dir, "keys/CA.cert"))
+# Session resumption: sessions cached by id (TLS 1.2) and session tickets
+# (on by default, no OP_NO_TICKET) skip the certificate exchange and the RSA
+# operations on reconnect. The id context is required with VERIFY_PEER.
+ctx.set_session_id(b"simple-echo")
+ctx.set_session_cache_mode(SSL.SESS_CACHE_SERVER)
+ctx.set_timeout(60 * 60)
 
 # Set up server
 server = SSL.Connection(ctx, socket.socket(socket.AF_INET, socket.SOCK_STREAM))
@@ -47,8 +53,47 @@ server.bind(("", int(sys.argv[1])))
 server.listen(3)
 server.setblocking(0)
 
+# pending output above HIGH_WATER bytes: stop reading the client until it drains
+# below LOW_WATER, so a client that does not read cannot grow its buffer forever
+HIGH_WATER = 64 * 1024
+LOW_WATER = 16 * 1024
+# largest TLS record
+CHUNK = 16 * 1024
+
+
+class Outbox:
+    """
+    Pending output of a client: a bytearray consumed from an offset, so that
+    appending and sending never copy the bytes still waiting
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def __len__(self):
+        return len(self.buffer) - self.offset
+
+    def append(self, data):
+        self.buffer += data
+
+    def send(self, cli):
+        with memoryview(self.buffer) as view:
+            ret = cli.send(view[self.offset : self.offset + CHUNK])
+        self.offset += ret
+        if self.offset == len(self.buffer):
+            self.buffer.clear()
+            self.offset = 0
+        elif self.offset >= len(self.buffer) // 2:
+            # reclaim the consumed half, amortized O(1) per byte
+            del self.buffer[: self.offset]
+            self.offset = 0
+        return ret
+
+
 clients = {}
 writers = {}
+paused = set()
 
 
 def dropClient(cli, errors=None):
@@ -60,6 +105,7 @@ def dropClient(cli, errors=None):
     del clients[cli]
     if cli in writers:
         del writers[cli]
+    paused.discard(cli)
     if not errors:
         cli.shutdown()
     cli.close()
@@ -67,7 +113,8 @@ def dropClient(cli, errors=None):
 
 while 1:
     try:
-        r, w, _ = select.select([server] + list(clients.keys()), writers.keys(), [])
+        readers = [cli for cli in clients if cli not in paused]
+        r, w, _ = select.select([server] + readers, writers.keys(), [])
     except:
         break
 
@@ -79,7 +126,7 @@ while 1:
 
         else:
             try:
-                ret = cli.recv(1024)
+                ret = cli.recv(CHUNK)
             except (SSL.WantReadError, SSL.WantWriteError, SSL.WantX509LookupError):
                 pass
             except SSL.ZeroReturnError:
@@ -88,12 +135,16 @@ while 1:
                 dropClient(cli, errors)
             else:
                 if cli not in writers:
-                    writers[cli] = ""
-                writers[cli] = writers[cli] + ret
+                    writers[cli] = Outbox()
+                writers[cli].append(ret)
+                if len(writers[cli]) > HIGH_WATER:
+                    paused.add(cli)
 
     for cli in w:
+        if cli not in writers:
+            continue
         try:
-            ret = cli.send(writers[cli])
+            writers[cli].send(cli)
         except (SSL.WantReadError, SSL.WantWriteError, SSL.WantX509LookupError):
             pass
         except SSL.ZeroReturnError:
@@ -101,8 +152,9 @@ while 1:
         except SSL.Error as errors:
             dropClient(cli, errors)
         else:
-            writers[cli] = writers[cli][ret:]
-            if writers[cli] == "":
+            if len(writers[cli]) < LOW_WATER:
+                paused.discard(cli)
+            if len(writers[cli]) == 0:
                 del writers[cli]
 
 for cli in clients.keys():
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import time
+from selectors import EVENT_READ, DefaultSelector
+from socket import socket as Socket
+from socket import socketpair
+from threading import Event, Thread
+from typing import Callable, Dict, List
+
+import click
+from socket_extended import FrameType, encode_frame, sendall_frames
+
+MESSAGE: str = "Alice (2026-03-25 10:00:00.000000)> " + "x" * 64
+
+
+def per_recipient(writers: List[Socket], messages: int, batch: int) -> None:
+    for _ in range(messages):
+        for w in writers:
+            w.sendall(encode_frame(FrameType.MESSAGE, MESSAGE.encode()))
+
+
+def encode_once(writers: List[Socket], messages: int, batch: int) -> None:
+    for _ in range(messages):
+        frame = encode_frame(FrameType.MESSAGE, MESSAGE.encode())
+        for w in writers:
+            w.sendall(frame)
+
+
+def encode_once_sendmsg(writers: List[Socket], messages: int, batch: int) -> None:
+    for i in range(0, messages, batch):
+        frames = [
+            encode_frame(FrameType.MESSAGE, MESSAGE.encode())
+            for _ in range(min(batch, messages - i))
+        ]
+        for w in writers:
+            sendall_frames(w, frames)
+
+
+STRATEGIES: Dict[str, Callable[[List[Socket], int, int], None]] = {
+    "encode-per-recipient": per_recipient,
+    "encode-once": encode_once,
+    "encode-once+sendmsg": encode_once_sendmsg,
+}
+
+
+def drain(readers: List[Socket], expected: int, done: Event) -> None:
+    selector = DefaultSelector()
+    for r in readers:
+        selector.register(r, EVENT_READ)
+    received = 0
+    while received < expected:
+        for key, _ in selector.select():
+            received += len(key.fileobj.recv(1 << 16))
+    selector.close()
+    done.set()
+
+
+def run(strategy: str, recipients: int, messages: int, batch: int) -> float:
+    pairs = [socketpair() for _ in range(recipients)]
+    writers = [w for w, _ in pairs]
+    readers = [r for _, r in pairs]
+    size = len(encode_frame(FrameType.MESSAGE, MESSAGE.encode()))
+    done = Event()
+    t = Thread(target=drain, args=(readers, size * messages * recipients, done))
+    t.daemon = True
+    t.start()
+    start = time.perf_counter()
+    STRATEGIES[strategy](writers, messages, batch)
+    done.wait()
+    elapsed = time.perf_counter() - start
+    for w, r in pairs:
+        w.close()
+        r.close()
+    return elapsed
+
+
+@click.command()
+@click.option(
+    "-r",
+    "--recipients",
+    help="Comma separated list of recipient counts",
+    default="1,10,100,1000",
+    show_default=True,
+)
+@click.option(
+    "-d",
+    "--deliveries",
+    help="Frames delivered per run (messages x recipients)",
+    default=200_000,
+    show_default=True,
+)
+@click.option(
+    "-b", "--batch", help="Frames per sendmsg call", default=16, show_default=True
+)
+def main(recipients: str, deliveries: int, batch: int) -> None:
+    print(f"{'strategy':<22} {'recipients':>10} {'messages/s':>12} {'deliveries/s':>14}")
+    for n in [int(r) for r in recipients.split(",")]:
+        messages = max(deliveries // n, batch)
+        for strategy in STRATEGIES:
+            elapsed = run(strategy, n, messages, batch)
+            print(
+                f"{strategy:<22} {n:>10} {messages / elapsed:>12.0f} "
+                f"{messages * n / elapsed:>14.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+from socket import AF_INET, SOCK_STREAM
+from socket import socket as Socket
+from threading import Thread
+from typing import Dict, List, Tuple
+
+import click
+from socket_extended import (
+    AF_UNIX,
+    FrameBuffer,
+    FrameType,
+    encode_frame,
+    sendall_frames,
+)
+
+TRANSPORTS: List[str] = ["tcp", "unix"]
+
+
+def connect(transport: str) -> Tuple[Socket, Socket]:
+    # a connected (client, server) pair over loopback TCP or a Unix socket
+    if transport == "tcp":
+        listener = Socket(family=AF_INET, type=SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+    else:
+        path = os.path.join(tempfile.gettempdir(), f"yacr-bench-{os.getpid()}.sock")
+        if os.path.exists(path):
+            os.unlink(path)
+        listener = Socket(family=AF_UNIX, type=SOCK_STREAM)
+        listener.bind(path)
+    listener.listen(1)
+    client = Socket(family=listener.family, type=SOCK_STREAM)
+    client.connect(listener.getsockname())
+    server, _ = listener.accept()
+    listener.close()
+    if transport == "unix":
+        os.unlink(path)
+    return client, server
+
+
+def echo(socket: Socket) -> None:
+    # sends every frame back until END
+    frames = FrameBuffer()
+    while (frame := frames.read(socket)) is not None and frame[0] != FrameType.END:
+        socket.sendall(encode_frame(*frame))
+
+
+def latency(transport: str, size: int, rounds: int) -> Dict[str, float]:
+    client, server = connect(transport)
+    t = Thread(target=echo, args=(server,))
+    t.start()
+    frame = encode_frame(FrameType.MESSAGE, b"x" * size)
+    frames = FrameBuffer()
+    rtts = []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        client.sendall(frame)
+        frames.read(client)
+        rtts.append(time.perf_counter_ns() - start)
+    client.sendall(encode_frame(FrameType.END))
+    t.join()
+    client.close()
+    server.close()
+    rtts.sort()
+    return {
+        "p50_us": rtts[len(rtts) // 2] / 1e3,
+        "p99_us": rtts[min(len(rtts) - 1, int(0.99 * len(rtts)))] / 1e3,
+    }
+
+
+def drain(socket: Socket, count: int) -> None:
+    frames = FrameBuffer()
+    for _ in range(count):
+        frames.read(socket)
+    socket.sendall(b"\0")
+
+
+def throughput(transport: str, size: int, count: int, batch: int) -> float:
+    # frames per second sent one way, the receiver acks the last one
+    client, server = connect(transport)
+    t = Thread(target=drain, args=(server, count))
+    t.start()
+    frame = encode_frame(FrameType.MESSAGE, b"x" * size)
+    start = time.perf_counter()
+    for i in range(0, count, batch):
+        sendall_frames(client, [frame] * min(batch, count - i))
+    client.recv(1)
+    elapsed = time.perf_counter() - start
+    t.join()
+    client.close()
+    server.close()
+    return count / elapsed
+
+
+@click.command()
+@click.option(
+    "-s",
+    "--sizes",
+    help="Comma separated list of payload sizes (bytes)",
+    default="64,1024,16384",
+    show_default=True,
+)
+@click.option(
+    "-r",
+    "--rounds",
+    help="Round trips per latency measure",
+    default=20_000,
+    show_default=True,
+)
+@click.option(
+    "-n",
+    "--frames",
+    help="Frames per throughput measure",
+    default=200_000,
+    show_default=True,
+)
+@click.option(
+    "-b", "--batch", help="Frames per sendmsg call", default=16, show_default=True
+)
+def main(sizes: str, rounds: int, frames: int, batch: int) -> None:
+    transports = TRANSPORTS if AF_UNIX is not None else ["tcp"]
+    print(
+        f"{'transport':<10} {'size':>6} {'rtt p50 us':>11} {'rtt p99 us':>11} "
+        f"{'frames/s':>10} {'MB/s':>8}"
+    )
+    for size in [int(s) for s in sizes.split(",")]:
+        for transport in transports:
+            rtt = latency(transport, size, rounds)
+            rate = throughput(transport, size, frames, batch)
+            mb = rate * len(encode_frame(FrameType.MESSAGE, b"x" * size)) / 1e6
+            print(
+                f"{transport:<10} {size:>6} {rtt['p50_us']:>11.1f} "
+                f"{rtt['p99_us']:>11.1f} {rate:>10.0f} {mb:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
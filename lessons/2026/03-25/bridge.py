@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import secrets
+import time
+from datetime import datetime
+from queue import SimpleQueue
+from struct import error as StructError
+from threading import Lock, Thread
+from typing import Callable, Dict, Iterator, List, Optional
+
+import codec
+from codec import Envelope
+from logger import Log
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# channel of the Redis YACR (lessons/2026/04-01), the lobby of the socket servers
+DEFAULT_CHANNEL: str = "yacr"
+MEMORY_URL: str = "memory://"
+# fields of an envelope and their types (time: epoch milliseconds)
+ENVELOPE_FIELDS: Dict[str, type] = {
+    "name": str,
+    "type": str,
+    "message": str,
+    "time": int,
+}
+# backoff between attempts to subscribe again after losing the broker
+RETRY_DELAY: float = 0.1
+MAX_RETRY_DELAY: float = 5
+
+
+class MemoryBroker:
+    # in-process stand-in of Redis pub/sub, with the publish() and pubsub()
+    # calls of redis-py used by the bridge: servers in the same process (or a
+    # test) federate through it without a Redis server
+    def __init__(self: MemoryBroker) -> None:
+        self.__channels: Dict[str, List[SimpleQueue]] = {}
+        self.__lock: Lock = Lock()
+
+    def publish(self: MemoryBroker, channel: str, data: bytes) -> int:
+        message = {"type": "message", "channel": channel.encode(), "data": data}
+        with self.__lock:
+            subscribers = list(self.__channels.get(channel, []))
+        for queue in subscribers:
+            queue.put(message)
+        return len(subscribers)
+
+    def pubsub(self: MemoryBroker) -> MemoryPubSub:
+        return MemoryPubSub(self)
+
+    def subscribe(self: MemoryBroker, channel: str, queue: SimpleQueue) -> None:
+        with self.__lock:
+            self.__channels.setdefault(channel, []).append(queue)
+
+    def unsubscribe(self: MemoryBroker, channel: str, queue: SimpleQueue) -> None:
+        with self.__lock:
+            self.__channels.get(channel, []).remove(queue)
+
+
+class MemoryPubSub:
+    def __init__(self: MemoryPubSub, broker: MemoryBroker) -> None:
+        self.__broker: MemoryBroker = broker
+        self.__queue: SimpleQueue = SimpleQueue()
+        self.__channels: List[str] = []
+
+    def subscribe(self: MemoryPubSub, *channels: str) -> None:
+        for channel in channels:
+            self.__broker.subscribe(channel, self.__queue)
+            self.__channels.append(channel)
+
+    def listen(self: MemoryPubSub) -> Iterator[Dict[str, any]]:
+        while (message := self.__queue.get()) is not None:
+            yield message
+
+    def close(self: MemoryPubSub) -> None:
+        for channel in self.__channels:
+            self.__broker.unsubscribe(channel, self.__queue)
+        self.__channels = []
+        self.__queue.put(None)
+
+
+def connect(url: str) -> any:
+    # memory:// or redis://host:port/db
+    if url.startswith(MEMORY_URL):
+        return MemoryBroker()
+    if redis is None:
+        raise ImportError("The Redis bridge needs the redis package (uv add redis)")
+    return redis.Redis.from_url(url)
+
+
+class Bridge:
+    def __init__(
+        self: Bridge,
+        log: Log,
+        broker: any,
+        deliver: Callable[[Envelope], None],
+        channel: str = DEFAULT_CHANNEL,
+    ) -> None:
+        self._log: Log = log
+        self.__broker: any = broker
+        self.__deliver: Callable[[Envelope], None] = deliver
+        self.__channel: str = channel
+        # tags the envelopes published here, so their echo is not delivered
+        # again; the origin travels in the envelope, hence always JSON
+        self.origin: str = secrets.token_hex(8)
+        self.__outbound: SimpleQueue = SimpleQueue()
+
+    def start(self: Bridge) -> None:
+        p: Thread = Thread(target=self.__publish)
+        p.daemon = True
+        p.start()
+        s: Thread = Thread(target=self.__subscribe)
+        s.daemon = True
+        s.start()
+
+    def publish(self: Bridge, name: str, type: str, message: str) -> None:
+        # never blocks the caller: a thread talks to the broker
+        self.__outbound.put(
+            {
+                "name": name,
+                "type": type,
+                "message": message,
+                "time": int(datetime.now().timestamp() * 1000),
+                "origin": self.origin,
+            }
+        )
+
+    def __publish(self: Bridge) -> None:
+        while True:
+            envelope = self.__outbound.get()
+            try:
+                self.__broker.publish(self.__channel, codec.encode("json", envelope))
+            except Exception as err:
+                self._log.warning(f"Bridge: message to {self.__channel} lost: {err}")
+
+    def __subscribe(self: Bridge) -> None:
+        delay = RETRY_DELAY
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.__broker.pubsub()
+                pubsub.subscribe(self.__channel)
+                self._log.info(f"Bridge: subscribed to {self.__channel}")
+                delay = RETRY_DELAY
+                for message in pubsub.listen():
+                    envelope = self.__decode(message)
+                    if envelope is not None:
+                        self.__forward(envelope)
+            except Exception as err:
+                self._log.warning(f"Bridge: subscription to {self.__channel}: {err}")
+            if pubsub is not None:
+                # a subscription is never left behind, not even in memory
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(delay)
+            delay = min(2 * delay, MAX_RETRY_DELAY)
+
+    def __forward(self: Bridge, envelope: Envelope) -> None:
+        # a message the server cannot deliver is dropped on its own, the
+        # subscription goes on
+        try:
+            self.__deliver(envelope)
+        except Exception as err:
+            self._log.warning(f"Bridge: message dropped: {err}")
+
+    def __decode(self: Bridge, message: Dict[str, any]) -> Optional[Envelope]:
+        if message.get("type") != "message":
+            return None
+        try:
+            envelope = codec.decode(message["data"])
+        except (ValueError, KeyError, StructError) as err:
+            self._log.warning(f"Bridge: message dropped: {err}")
+            return None
+        if not isinstance(envelope, dict) or any(
+            not isinstance(envelope.get(f), t) for f, t in ENVELOPE_FIELDS.items()
+        ):
+            self._log.warning("Bridge: message dropped: not an envelope")
+            return None
+        if envelope.get("origin") == self.origin:
+            # published here, already delivered to the local clients
+            return None
+        return envelope
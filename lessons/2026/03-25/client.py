@@ -1,12 +1,66 @@
 from __future__ import annotations
 
+import json
+import os
+import time
+from socket import SHUT_WR, SOCK_STREAM
+from socket import socket as Socket
+from ssl import SSLContext, SSLError
+from threading import Lock, Thread
+from typing import Callable, Dict, Optional, Tuple
+
 from logger import Log
-from socket_extended import DEFAULT_HOST, DEFAULT_PORT, SocketExtended
+from socket_extended import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    SEQUENCE,
+    FrameError,
+    FrameType,
+    SocketExtended,
+    encode_frame,
+)
+from session import ACK_EVERY, DEFAULT_RESUME_GRACE
+from transfer import (
+    DEFAULT_DOWNLOADS,
+    TRANSFER_ATTEMPTS,
+    TRANSFER_TIMEOUT,
+    read_reply,
+    receive_file,
+    send_file,
+)
+
+# backoff between attempts to resume a lost connection
+RECONNECT_DELAY: float = 0.1
+MAX_RECONNECT_DELAY: float = 2
 
 
 class Client(SocketExtended):
-    def __init__(self: SocketExtended, log: Log) -> None:
-        super().__init__(log)
+    def __init__(
+        self: SocketExtended,
+        log: Log,
+        path: str = None,
+        tls: SSLContext = None,
+        downloads: str = DEFAULT_DOWNLOADS,
+    ) -> None:
+        super().__init__(log, path=path)
+        self.__tls: SSLContext = tls
+        self.__downloads: str = downloads
+        # files waiting for the go-ahead of the server, by reference
+        self.__uploads: Dict[int, str] = {}
+        self.__ref: int = 0
+        # files offered to us, by id
+        self.__offers: Dict[str, Dict[str, any]] = {}
+        self.__lock: Lock = Lock()
+        # resumable session: token issued by the server, last message received
+        # and last one acked
+        self.__token: str = None
+        self.__grace: float = DEFAULT_RESUME_GRACE
+        self.__received: int = 0
+        self.__acked: int = 0
+        # bumped by every reconnection: after one failure seen by both the
+        # reader and the writer thread, only one of them reconnects
+        self.__generation: int = 0
+        self.__reconnecting: Lock = Lock()
 
     def start(
         self: Client,
@@ -14,20 +68,251 @@ class Client(SocketExtended):
         host: str = DEFAULT_HOST,
         port: int = DEFAULT_PORT,
     ) -> None:
+        self.__host: str = host
+        self.__port: int = port
+        self.__name = name
+        where = self._where(host, port)
         try:
-            self._socket.connect((host, port))
-            self._log.success(f"Connected to the server {host}:{port}")
-        except ConnectionRefusedError as cr_err:
+            self.__connect()
+            self._log.success(f"Connected to the server {where}")
+        except (ConnectionRefusedError, FileNotFoundError) as cr_err:
             self._log.exception(
-                f"Connection refused from the server {host}:{port}", error=cr_err
+                f"Connection refused from the server {where}", error=cr_err
             )
         except TimeoutError as to_err:
             self._log.exception(
-                f"Timeout error during connection to the server {host}:{port}",
+                f"Timeout error during connection to the server {where}",
                 error=to_err,
             )
+        except SSLError as ssl_err:
+            self._log.exception(
+                f"TLS handshake with the server {where} failed", error=ssl_err
+            )
+        if self.__tls is not None:
+            self._log.success(f"TLS connection established ({self._socket.version()})")
+        self.__join()
 
-        self.__host: str = host
-        self.__port: int = port
-        self.__name = name
-        self._socket.send(name.encode())
+    def send_frame(self: Client, type: FrameType, payload: bytes = b"") -> None:
+        if type == FrameType.END:
+            # leaving the chat: the reader must not resume the session
+            self.__token = None
+        generation = self.__generation
+        try:
+            super().send_frame(type, payload)
+        except OSError:
+            if not self.__reconnect(generation):
+                raise
+            super().send_frame(type, payload)
+
+    def recv_frame(self: Client) -> Optional[Tuple[int, bytes]]:
+        # SEQUENCED messages come out as MESSAGE frames, once each, and a
+        # lost connection is resumed within the grace window of the session
+        while True:
+            generation = self.__generation
+            try:
+                frame = super().recv_frame()
+            except (FrameError, OSError):
+                frame = None
+            if frame is None:
+                if self.__reconnect(generation):
+                    continue
+                return None
+            type, payload = frame
+            if type == FrameType.SEQUENCED:
+                (sequence,) = SEQUENCE.unpack_from(payload)
+                if sequence <= self.__received:
+                    # replayed by the resume, already received
+                    continue
+                if sequence > self.__received + 1:
+                    # dropped by the server for a slow consumer (drop-oldest
+                    # or drop-newest): counted as lost, not replayed
+                    lost = sequence - self.__received - 1
+                    self._log.warning(f"{lost} messages dropped by the server")
+                self.__received = sequence
+                if sequence - self.__acked >= ACK_EVERY:
+                    self.__ack()
+                return FrameType.MESSAGE, payload[SEQUENCE.size :]
+            if type == FrameType.SESSION:
+                text = self.__session(payload)
+                if text is not None:
+                    return FrameType.MESSAGE, text.encode()
+                continue
+            if type == FrameType.END:
+                # the session expired before we came back
+                if self.__reconnect(generation, resume=False):
+                    return FrameType.MESSAGE, b"Session expired, joined the chat again"
+                return None
+            if type == FrameType.PING:
+                self.__ack()
+            return frame
+
+    def __connect(self: Client) -> None:
+        self._socket.connect(self._address(self.__host, self.__port))
+        if self.__tls is not None:
+            self._secure(self.__tls, hostname=self.__host)
+
+    def __join(self: Client) -> None:
+        # NAME, then SESSION to get a token (servers without sessions ignore it)
+        super().send_frame(FrameType.NAME, self.__name.encode())
+        super().send_frame(FrameType.SESSION)
+
+    def __session(self: Client, payload: bytes) -> Optional[str]:
+        reply = json.loads(payload)
+        self.__token = reply["token"]
+        self.__grace = reply.get("grace", self.__grace)
+        if not reply.get("resumed", False):
+            return None
+        lost = reply.get("lost", 0)
+        # gone from the resume buffer: the replay starts after them
+        self.__received += lost
+        return "Session resumed" + (f", {lost} messages lost" if lost else "")
+
+    def __ack(self: Client) -> None:
+        if self.__received > self.__acked:
+            self.__acked = self.__received
+            self.send_frame(FrameType.ACK, str(self.__acked).encode())
+
+    def __reconnect(self: Client, generation: int, resume: bool = True) -> bool:
+        with self.__reconnecting:
+            if generation != self.__generation:
+                # the other thread already reconnected
+                return True
+            if resume and self.__token is None:
+                return False
+            self._log.warning("Connection lost, reconnecting")
+            deadline = time.monotonic() + self.__grace
+            delay = RECONNECT_DELAY
+            while time.monotonic() < deadline:
+                try:
+                    self._renew()
+                    self.__connect()
+                    if resume:
+                        hello = {"token": self.__token, "ack": self.__received}
+                        self.__acked = self.__received
+                        payload = json.dumps(hello).encode()
+                        super().send_frame(FrameType.SESSION, payload)
+                    else:
+                        # a new session numbers its messages from 1
+                        self.__token = None
+                        self.__received = self.__acked = 0
+                        self.__join()
+                    self.__generation += 1
+                    return True
+                except OSError as os_err:
+                    self._log.debug(f"Reconnection failed: {os_err}")
+                    time.sleep(delay)
+                    delay = min(2 * delay, MAX_RECONNECT_DELAY)
+            return False
+
+    def offer(self: Client, to: str, path: str) -> None:
+        size = os.path.getsize(path)
+        with self.__lock:
+            self.__ref += 1
+            self.__uploads[self.__ref] = path
+        request = {
+            "to": to,
+            "name": os.path.basename(path),
+            "size": size,
+            "ref": self.__ref,
+        }
+        self.send_frame(FrameType.OFFER, json.dumps(request).encode())
+
+    def offered(self: Client, payload: bytes, notify: Callable[[str], None]) -> None:
+        # OFFER from the server: the go-ahead for one of our files (ref), or a
+        # file offered to us (from)
+        try:
+            offer = json.loads(payload)
+        except ValueError:
+            self._log.debug("Malformed file offer from the server")
+            return
+        if "ref" in offer:
+            with self.__lock:
+                path = self.__uploads.pop(offer["ref"], None)
+            if path is not None:
+                self.__background(self.__upload, offer["id"], path, notify)
+            return
+        with self.__lock:
+            self.__offers[offer["id"]] = offer
+        notify(
+            f"{offer['from']} offers {offer['name']} ({offer['size']} bytes), "
+            f"type /accept {offer['id']} to download it"
+        )
+
+    def accept(self: Client, id: str, notify: Callable[[str], None]) -> None:
+        with self.__lock:
+            offer = self.__offers.get(id)
+        if offer is None:
+            notify(f"No file offered with id {id}")
+            return
+        self.__background(self.__download, offer, notify)
+
+    def __background(self: Client, target: Callable, *args: any) -> None:
+        # transfers run on their own connection and thread, the chat goes on
+        t: Thread = Thread(target=target, args=args)
+        t.daemon = True
+        t.start()
+
+    def __upload(
+        self: Client, id: str, path: str, notify: Callable[[str], None]
+    ) -> None:
+        name = os.path.basename(path)
+        for _ in range(TRANSFER_ATTEMPTS):
+            try:
+                size = os.path.getsize(path)
+                socket, offset = self.__connect_data(FrameType.UPLOAD, id)
+                with socket:
+                    offset = send_file(socket, path, offset, size)
+                    # the server closes the connection once the file is spooled
+                    socket.shutdown(SHUT_WR)
+                    socket.recv(1)
+                if offset == size:
+                    return
+            except (OSError, FrameError) as err:
+                self._log.debug(f"Upload of {name} interrupted: {err}")
+        notify(f"Upload of {name} failed")
+
+    def __download(
+        self: Client, offer: Dict[str, any], notify: Callable[[str], None]
+    ) -> None:
+        os.makedirs(self.__downloads, exist_ok=True)
+        path = os.path.join(self.__downloads, os.path.basename(offer["name"]))
+        partial = f"{path}.part"
+        for _ in range(TRANSFER_ATTEMPTS):
+            try:
+                # resumes after the bytes of the previous attempts
+                offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+                socket, size = self.__connect_data(
+                    FrameType.DOWNLOAD, f"{offer['id']} {offset}"
+                )
+                with socket:
+                    offset = receive_file(socket, partial, offset, size)
+                if offset == size:
+                    os.replace(partial, path)
+                    notify(f"{offer['name']} saved in {path}")
+                    return
+            except (OSError, FrameError) as err:
+                self._log.debug(f"Download of {offer['name']} interrupted: {err}")
+        notify(f"Download of {offer['name']} failed, /accept {offer['id']} resumes it")
+
+    def __connect_data(
+        self: Client, type: FrameType, request: str
+    ) -> Tuple[Socket, int]:
+        # a new connection for each transfer: the reply is the offset to
+        # upload from, or the size of the file to download
+        socket = Socket(family=self._socket.family, type=SOCK_STREAM)
+        socket.settimeout(TRANSFER_TIMEOUT)
+        try:
+            socket.connect(self._address(self.__host, self.__port))
+            if self.__tls is not None:
+                socket = self.__tls.wrap_socket(socket, server_hostname=self.__host)
+            socket.sendall(encode_frame(type, request.encode()))
+            reply = read_reply(socket)
+            if reply is None:
+                raise FrameError("Connection closed by the server")
+            if reply[0] != type or not reply[1].isdigit():
+                reason = reply[1].decode(errors="replace")
+                raise FrameError(f"Transfer refused: {reason}")
+            return socket, int(reply[1])
+        except (OSError, FrameError):
+            socket.close()
+            raise
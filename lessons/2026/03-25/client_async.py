@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+from asyncio import StreamReader, StreamWriter
+from ssl import SSLContext
+from typing import Optional, Tuple
+
+from logger import Log
+from server_async import read_frame
+from socket_extended import DEFAULT_HOST, DEFAULT_PORT, FrameType, encode_frame
+
+
+class AsyncClient:
+    # the Client API on asyncio streams: a task per connection instead of a
+    # thread, so one process runs thousands of them (see the bench command)
+    def __init__(self: AsyncClient, log: Log, tls: SSLContext = None) -> None:
+        self._log: Log = log
+        self.__tls: SSLContext = tls
+        self.__reader: StreamReader = None
+        self.__writer: StreamWriter = None
+
+    async def start(
+        self: AsyncClient,
+        name: str,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ) -> None:
+        # connection errors (OSError, SSLError) are left to the caller
+        self.__reader, self.__writer = await asyncio.open_connection(
+            host, port, ssl=self.__tls
+        )
+        self._log.debug(f"Connected to the server {host}:{port}")
+        self.__host: str = host
+        self.__port: int = port
+        self.__name: str = name
+        await self.send_frame(FrameType.NAME, name.encode())
+
+    async def send_frame(
+        self: AsyncClient, type: FrameType, payload: bytes = b""
+    ) -> None:
+        self.__writer.write(encode_frame(type, payload))
+        await self.__writer.drain()
+
+    async def recv_frame(self: AsyncClient) -> Optional[Tuple[int, bytes]]:
+        # the PINGs of the server heartbeat are answered here
+        while (frame := await read_frame(self.__reader)) is not None:
+            if frame[0] != FrameType.PING:
+                return frame
+            await self.send_frame(FrameType.PONG)
+        return None
+
+    async def close(self: AsyncClient) -> None:
+        self.__writer.close()
+        try:
+            await self.__writer.wait_closed()
+        except OSError:
+            pass
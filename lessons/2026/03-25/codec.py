@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+from struct import Struct
+from typing import Callable, Dict, List, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# envelope: {"name": str, "type": str, "message": str, "time": epoch millis}
+Envelope = Dict[str, any]
+
+# binary layout: time (int64 ms), type length (uint8), name length (uint16),
+# message length (uint32), then type, name and message in UTF-8
+BINARY_HEADER: Struct = Struct("!qBHI")
+
+
+def encode_json(envelope: Envelope) -> bytes:
+    return json.dumps(envelope, separators=(",", ":")).encode()
+
+
+def decode_json(data: bytes) -> Envelope:
+    return json.loads(data)
+
+
+def encode_msgpack(envelope: Envelope) -> bytes:
+    return msgpack.packb(envelope)
+
+
+def decode_msgpack(data: bytes) -> Envelope:
+    return msgpack.unpackb(data)
+
+
+def encode_binary(envelope: Envelope) -> bytes:
+    type = envelope["type"].encode()
+    name = envelope["name"].encode()
+    message = envelope["message"].encode()
+    header = BINARY_HEADER.pack(envelope["time"], len(type), len(name), len(message))
+    return b"".join((header, type, name, message))
+
+
+def decode_binary(data: bytes) -> Envelope:
+    time, t, n, m = BINARY_HEADER.unpack_from(data)
+    t += BINARY_HEADER.size
+    n += t
+    return {
+        "name": data[t:n].decode(),
+        "type": data[BINARY_HEADER.size : t].decode(),
+        "message": data[n : n + m].decode(),
+        "time": time,
+    }
+
+
+# name -> (tag byte, encoder, decoder)
+CODECS: Dict[str, Tuple[bytes, Callable, Callable]] = {
+    "binary": (b"b", encode_binary, decode_binary),
+    "msgpack": (b"m", encode_msgpack, decode_msgpack),
+    "json": (b"j", encode_json, decode_json),
+}
+if msgpack is None:
+    del CODECS["msgpack"]
+
+DEFAULT_CODEC: str = "json"
+TAGS: Dict[bytes, str] = {tag: name for name, (tag, _, _) in CODECS.items()}
+
+
+def available() -> List[str]:
+    return list(CODECS)
+
+
+def select(name: str) -> str:
+    # a local choice, nothing is negotiated with the peers: every payload is
+    # tagged, so they decode whatever codec we pick; JSON needs no extra package
+    return name if name in CODECS else DEFAULT_CODEC
+
+
+def encode(codec: str, envelope: Envelope) -> bytes:
+    # tagged: the first byte names the codec so any peer can decode it
+    tag, encoder, _ = CODECS[codec]
+    return tag + encoder(envelope)
+
+
+def decode(data: bytes) -> Envelope:
+    name = TAGS.get(data[:1])
+    if name is None:
+        raise ValueError(f"Unknown codec tag {data[:1]!r}")
+    return CODECS[name][2](data[1:])
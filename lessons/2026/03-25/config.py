@@ -1,9 +1,17 @@
 from __future__ import annotations
 
-from typing import Dict
+import os
+from typing import Dict, Optional
 
 import yaml
+from history import DEFAULT_HISTORY_SIZE
 from logger import Log
+from outbound import DEFAULT_QUEUE_SIZE, SlowConsumerPolicy
+from scrollback import DEFAULT_SCROLLBACK
+from session import DEFAULT_RESUME_BUFFER, DEFAULT_RESUME_GRACE
+from socket_extended import DEFAULT_BACKLOG, DEFAULT_HEARTBEAT, DEFAULT_IDLE_TIMEOUT
+from tls import DEFAULT_HANDSHAKE_WORKERS
+from transfer import DEFAULT_DOWNLOADS, DEFAULT_SPOOL
 
 
 class Config:
@@ -49,3 +57,123 @@ class Config:
         if o is not None:
             return o
         self.__log.exception("Name not found in the configuration file/command line options", terminate=True)
+
+    @property
+    def scrollback(self: Config) -> int:
+        o = self.__config.get("scrollback", None)
+        if o is not None:
+            return o
+        o = self.__data.get("scrollback", None)
+        if o is not None:
+            return o
+        return DEFAULT_SCROLLBACK
+
+    @property
+    def path(self: Config) -> Optional[str]:
+        # Unix socket of the server, replaces host and port when set
+        return self.__server_option("path", None)
+
+    @property
+    def address(self: Config) -> Dict[str, any]:
+        # keyword arguments of Client.start and Server.start
+        if self.path is not None:
+            return {}
+        return {"host": self.host, "port": self.port}
+
+    @property
+    def downloads(self: Config) -> str:
+        o = self.__config.get("downloads", None)
+        if o is not None:
+            return o
+        o = self.__data.get("downloads", None)
+        if o is not None:
+            return o
+        return DEFAULT_DOWNLOADS
+
+    @property
+    def spool(self: Config) -> str:
+        return self.__server_option("spool", DEFAULT_SPOOL)
+
+    @property
+    def resume_grace(self: Config) -> float:
+        return self.__server_option("resume_grace", DEFAULT_RESUME_GRACE)
+
+    @property
+    def resume_buffer(self: Config) -> int:
+        return self.__server_option("resume_buffer", DEFAULT_RESUME_BUFFER)
+
+    @property
+    def admin_port(self: Config) -> Optional[int]:
+        # JSON stats endpoint on 127.0.0.1, off when neither port nor path is set
+        return self.__server_option("admin_port", None)
+
+    @property
+    def admin_path(self: Config) -> Optional[str]:
+        return self.__server_option("admin_path", None)
+
+    @property
+    def bridge(self: Config) -> Optional[str]:
+        # URL of the broker shared with the other servers, None for no bridge
+        return self.__server_option("bridge", None)
+
+    @property
+    def queue_size(self: Config) -> int:
+        return self.__server_option("queue_size", DEFAULT_QUEUE_SIZE)
+
+    @property
+    def slow_consumer(self: Config) -> str:
+        return self.__server_option("slow_consumer", SlowConsumerPolicy.DROP_OLDEST.value)
+
+    @property
+    def workers(self: Config) -> int:
+        return self.__server_option("workers", os.cpu_count())
+
+    @property
+    def backlog(self: Config) -> int:
+        return self.__server_option("backlog", DEFAULT_BACKLOG)
+
+    @property
+    def heartbeat(self: Config) -> float:
+        return self.__server_option("heartbeat", DEFAULT_HEARTBEAT)
+
+    @property
+    def idle_timeout(self: Config) -> float:
+        return self.__server_option("idle_timeout", DEFAULT_IDLE_TIMEOUT)
+
+    @property
+    def history_size(self: Config) -> int:
+        return self.__server_option("history_size", DEFAULT_HISTORY_SIZE)
+
+    @property
+    def handshake_workers(self: Config) -> int:
+        return self.__server_option("handshake_workers", DEFAULT_HANDSHAKE_WORKERS)
+
+    @property
+    def tls(self: Config) -> Optional[Dict[str, str]]:
+        # keyword arguments of server_context/client_context, None for plain TCP;
+        # the command line options win over the file
+        o = self.__config["server"].get("tls", None)
+        c = self.__data["server"].get("tls", None)
+        if c is not None:
+            o = {**(o or {}), **{k: v for k, v in c.items() if v is not None}}
+        return o
+
+    @property
+    def logging(self: Config) -> Dict[str, any]:
+        # keyword arguments of Log.configure, the command line flags win
+        o = dict(self.__config.get("logging", None) or {})
+        o.update(
+            {k: v for k, v in self.__data.get("logging", {}).items() if v is not None}
+        )
+        return o
+
+    def __server_option(self: Config, key: str, default: any) -> any:
+        # an explicit command line option wins over the file, which holds the
+        # usual values
+        o = self.__data["server"].get(key, None)
+        if o is not None:
+            return o
+        o = self.__config["server"].get(key, None)
+        if o is not None:
+            return o
+        return default
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+DEFAULT_HISTORY_SIZE: int = 100
+
+
+class History:
+    def __init__(self: History, size: int = DEFAULT_HISTORY_SIZE) -> None:
+        # preallocated slots: the frame with sequence number n lives at n % size
+        self.__frames: List[Optional[bytes]] = [None] * size
+        self.__sequence: int = 0
+
+    @property
+    def sequence(self: History) -> int:
+        return self.__sequence
+
+    def append(self: History, frame: bytes) -> int:
+        self.__sequence += 1
+        if self.__frames:
+            self.__frames[self.__sequence % len(self.__frames)] = frame
+        return self.__sequence
+
+    def since(self: History, sequence: int = 0) -> List[bytes]:
+        # frames after the given sequence number that are still in the buffer
+        first = max(sequence, self.__sequence - len(self.__frames), 0) + 1
+        return [
+            self.__frames[n % len(self.__frames)]
+            for n in range(first, self.__sequence + 1)
+        ]
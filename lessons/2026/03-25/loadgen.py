@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from asyncio import StreamReader, StreamWriter
+from ssl import SSLContext
+from typing import Dict, List, Optional, Tuple
+
+from client_async import AsyncClient
+from logger import Log
+from server_async import run
+from socket_extended import DEFAULT_HOST, DEFAULT_PORT, HEADER, FrameError, FrameType
+
+PROTOCOLS: List[str] = ["framed", "raw"]
+
+# bench:<client>:<sequence>:<send time in ns>;
+MARKER: re.Pattern = re.compile(r"bench:(\d+):(\d+):(\d+);")
+
+
+def percentiles(values: List[int]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def rank(p: float) -> float:
+        return values[min(len(values) - 1, int(p * len(values)))] / 1e6
+
+    return {
+        "count": len(values),
+        "p50_ms": rank(0.50),
+        "p95_ms": rank(0.95),
+        "p99_ms": rank(0.99),
+        "max_ms": values[-1] / 1e6,
+    }
+
+
+class RawClient:
+    # the AsyncClient API over the unframed protocol of the older lessons: the
+    # name, then the messages, "end" to leave; a read is a message
+    def __init__(self: RawClient, log: Log, tls: SSLContext = None) -> None:
+        self._log: Log = log
+        self.__tls: SSLContext = tls
+        self.__reader: StreamReader = None
+        self.__writer: StreamWriter = None
+
+    async def start(
+        self: RawClient,
+        name: str,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ) -> None:
+        self.__reader, self.__writer = await asyncio.open_connection(
+            host, port, ssl=self.__tls
+        )
+        await self.send_frame(FrameType.NAME, name.encode())
+
+    async def send_frame(
+        self: RawClient, type: FrameType, payload: bytes = b""
+    ) -> None:
+        self.__writer.write(payload)
+        await self.__writer.drain()
+
+    async def recv_frame(self: RawClient) -> Optional[Tuple[int, bytes]]:
+        data = await self.__reader.read(1 << 16)
+        return (FrameType.MESSAGE, data) if data else None
+
+    async def close(self: RawClient) -> None:
+        self.__writer.close()
+        try:
+            await self.__writer.wait_closed()
+        except OSError:
+            pass
+
+
+# client of each protocol, and the bytes of a message besides its payload
+CLIENTS: Dict[str, Tuple[type, int]] = {
+    "framed": (AsyncClient, HEADER.size),
+    "raw": (RawClient, 0),
+}
+
+
+class LoadGenerator:
+    def __init__(
+        self: LoadGenerator,
+        log: Log,
+        clients: int = 100,
+        rate: float = 1000,
+        duration: float = 10,
+        size: int = 64,
+        protocol: str = "framed",
+        join_timeout: float = 5,
+        tls: SSLContext = None,
+    ) -> None:
+        self._log: Log = log
+        self.__clients: int = clients
+        self.__rate: float = rate
+        self.__duration: float = duration
+        self.__padding: str = "x" * size
+        self.__protocol: str = protocol
+        self.__join_timeout: float = join_timeout
+        self.__tls: SSLContext = tls
+        self.__joins: List[int] = []
+        self.__latencies: List[int] = []
+        self.__sent: int = 0
+        self.__sent_bytes: int = 0
+        self.__received_bytes: int = 0
+        self.__errors: int = 0
+
+    def start(
+        self: LoadGenerator,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ) -> Dict[str, any]:
+        return run(self.__run(host=host, port=port))
+
+    async def __run(self: LoadGenerator, host: str, port: int) -> Dict[str, any]:
+        self._log.info(
+            f"Starting {self.__clients} clients against {host}:{port} "
+            f"({self.__rate} msg/s for {self.__duration}s, {self.__protocol})"
+        )
+        start = time.monotonic() + self.__join_timeout
+        await asyncio.gather(
+            *(self.__client(i, host, port, start) for i in range(self.__clients))
+        )
+        elapsed = self.__duration
+        return {
+            "protocol": self.__protocol,
+            "tls": self.__tls is not None,
+            "host": host,
+            "port": port,
+            "clients": self.__clients,
+            "rate": self.__rate,
+            "duration": self.__duration,
+            "size": len(self.__padding),
+            "join": percentiles(self.__joins),
+            "delivery": percentiles(self.__latencies),
+            "sent": {
+                "messages": self.__sent,
+                "bytes": self.__sent_bytes,
+                "messages_per_s": self.__sent / elapsed,
+                "bytes_per_s": self.__sent_bytes / elapsed,
+            },
+            "received": {
+                "messages": len(self.__latencies),
+                "bytes": self.__received_bytes,
+                "messages_per_s": len(self.__latencies) / elapsed,
+                "bytes_per_s": self.__received_bytes / elapsed,
+            },
+            "errors": self.__errors,
+        }
+
+    async def __client(
+        self: LoadGenerator, id: int, host: str, port: int, start: float
+    ) -> None:
+        name = f"bench-{id}"
+        kind, overhead = CLIENTS[self.__protocol]
+        client: AsyncClient | RawClient = kind(self._log, tls=self.__tls)
+        t0 = time.monotonic_ns()
+        try:
+            # with TLS the join time includes the handshake
+            await client.start(name=name, host=host, port=port)
+        except OSError:
+            self.__errors += 1
+            return
+        self.__sent_bytes += overhead + len(name.encode())
+        joined = asyncio.Event()
+        receiver = asyncio.create_task(self.__receive(client, name, t0, joined))
+        try:
+            await asyncio.wait_for(joined.wait(), timeout=self.__join_timeout)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await self.__load(client, id, start)
+            # leave time for the last messages to be delivered
+            await asyncio.sleep(1)
+            end = "end" if self.__protocol == "raw" else ""
+            await self.__send(client, FrameType.END, end)
+        except OSError:
+            self.__errors += 1
+        receiver.cancel()
+        await client.close()
+
+    async def __load(
+        self: LoadGenerator, client: AsyncClient | RawClient, id: int, start: float
+    ) -> None:
+        interval = self.__clients / self.__rate
+        # spread the clients over the first interval
+        deadline = start + interval * id / self.__clients
+        end = start + self.__duration
+        seq = 0
+        while deadline < end:
+            await asyncio.sleep(max(0, deadline - time.monotonic()))
+            await self.__send(
+                client,
+                FrameType.MESSAGE,
+                f"bench:{id}:{seq}:{time.monotonic_ns()};{self.__padding}",
+            )
+            self.__sent += 1
+            seq += 1
+            deadline += interval
+
+    async def __send(
+        self: LoadGenerator, client: AsyncClient | RawClient, type: FrameType, text: str
+    ) -> None:
+        payload = text.encode()
+        self.__sent_bytes += CLIENTS[self.__protocol][1] + len(payload)
+        await client.send_frame(type, payload)
+
+    async def __receive(
+        self: LoadGenerator,
+        client: AsyncClient | RawClient,
+        name: str,
+        t0: int,
+        joined: asyncio.Event,
+    ) -> None:
+        announcement = re.compile(rf"{re.escape(name)} \([^)]*\) joined the chat")
+        overhead = CLIENTS[self.__protocol][1]
+        pending = ""
+        try:
+            while (frame := await client.recv_frame()) is not None:
+                self.__received_bytes += overhead + len(frame[1])
+                text = frame[1].decode(errors="replace")
+                now = time.monotonic_ns()
+                # raw streams may split a marker across reads
+                pending += text
+                if not joined.is_set() and announcement.search(pending):
+                    self.__joins.append(now - t0)
+                    joined.set()
+                last = 0
+                for m in MARKER.finditer(pending):
+                    self.__latencies.append(now - int(m.group(3)))
+                    last = m.end()
+                pending = pending[last:][-256:]
+        except (FrameError, OSError):
+            self.__errors += 1
@@ -1,29 +1,138 @@
 from __future__ import annotations
 
+import atexit
+import os
+import random
 import sys
+import time
+from functools import partial
+from queue import Full, Queue
+from threading import Lock, Thread
+from typing import Dict, List, Tuple
 
 from loguru import logger
 
+DEFAULT_LOG_QUEUE_SIZE: int = 10_000
+
 
 class Log:
-    def __init__(self: Log, filename: str = None) -> None:
+    def __init__(
+        self: Log,
+        filename: str = None,
+        asynchronous: bool = False,
+        queue_size: int = DEFAULT_LOG_QUEUE_SIZE,
+        json: bool = False,
+        sample: Dict[str, float] = None,
+        rate: Dict[str, float] = None,
+    ) -> None:
         logger.remove()
-        self.__log = logger
+        # sampling and rate limits are decided once per record, for every sink
+        self.__log = logger.patch(self.__admit)
         self.__log.remove()
-        self.__log.add(
-            sink=sys.stdout,
-            format="[{time:HH:mm:ss}] <lvl>{message}</lvl>",
-            level="DEBUG",
+        self.__filename: str = filename
+        self.__lock: Lock = Lock()
+        self.__queue: Queue = None
+        self.__writer: Thread = None
+        self.__dropped: int = 0
+        self.configure(
+            asynchronous=asynchronous,
+            queue_size=queue_size,
+            json=json,
+            sample=sample,
+            rate=rate,
         )
-        if filename is not None:
-            self.__log.add(
-                filename, format="{name} {message}", level="DEBUG", rotation="5 MB"
-            )
         self.success = self.__log.success
         self.warning = self.__log.warning
         self.info = self.__log.info
         self.debug = self.__log.debug
         self.error = self.__log.error
+        atexit.register(self.close)
+        os.register_at_fork(after_in_child=self.__after_fork)
+
+    @property
+    def dropped(self: Log) -> int:
+        # records not written because of sampling, rate limits or a full queue
+        return self.__dropped
+
+    def configure(
+        self: Log,
+        asynchronous: bool = False,
+        queue_size: int = DEFAULT_LOG_QUEUE_SIZE,
+        json: bool = False,
+        sample: Dict[str, float] = None,
+        rate: Dict[str, float] = None,
+    ) -> None:
+        self.close()
+        self.__log.remove()
+        self.__queue = None
+        # kept to configure the sinks again when the file changes
+        self.__options: Dict[str, any] = {
+            "asynchronous": asynchronous,
+            "queue_size": queue_size,
+            "json": json,
+            "sample": sample,
+            "rate": rate,
+        }
+        # level -> fraction of the records kept
+        self.__sample: Dict[str, float] = {
+            k.upper(): v for k, v in (sample or {}).items()
+        }
+        # level -> records per second, enforced with a token bucket
+        self.__rate: Dict[str, float] = {k.upper(): v for k, v in (rate or {}).items()}
+        self.__buckets: Dict[str, Tuple[float, float]] = {}
+        sinks: List[Tuple[any, str, Dict[str, any]]] = [
+            (sys.stdout, "[{time:HH:mm:ss}] <lvl>{message}</lvl>", {})
+        ]
+        if self.__filename is not None:
+            sinks.append((self.__filename, "{name} {message}", {"rotation": "5 MB"}))
+        if not asynchronous:
+            for sink, format, options in sinks:
+                self.__log.add(
+                    sink=sink,
+                    format=format,
+                    level="DEBUG",
+                    filter=lambda record: record["admitted"],
+                    serialize=json,
+                    **options,
+                )
+            return
+        # the caller formats the record and puts it in a bounded queue, a writer
+        # thread does the I/O: a slow disk or terminal never blocks the caller
+        self.__queue = Queue(maxsize=queue_size)
+        for i, (sink, format, options) in enumerate(sinks):
+            self.__log.add(
+                sink=partial(self.__enqueue, i),
+                format=format,
+                level="DEBUG",
+                filter=lambda record: record["admitted"],
+                colorize=sink is sys.stdout and not json,
+                serialize=json,
+            )
+            self.__log.add(
+                sink=sink,
+                format="{message}",
+                level="DEBUG",
+                filter=lambda record, i=i: record["extra"].get("sink") == i,
+                **options,
+            )
+        self.__start_writer()
+
+    def split(self: Log, suffix: str) -> None:
+        # a forked worker writes a file of its own (name-suffix.log): processes
+        # sharing a file would rotate it under each other
+        if self.__filename is None:
+            return
+        stem, ext = os.path.splitext(self.__filename)
+        self.__filename = f"{stem}-{suffix}{ext}"
+        self.configure(**self.__options)
+
+    def close(self: Log) -> None:
+        # writes what is still queued and stops the writer
+        if self.__writer is None:
+            return
+        self.__queue.put(None)
+        self.__writer.join(timeout=5)
+        self.__writer = None
 
     def exception(
         self: Log,
@@ -39,3 +148,55 @@ class Log:
             self.debug(f"Exception: {exception}")
         if terminate:
             sys.exit()
+
+    def __admit(self: Log, record: Dict[str, any]) -> None:
+        # records written by the writer thread only go to the real sinks
+        record["admitted"] = "sink" not in record["extra"] and self.__keep(
+            record["level"].name
+        )
+
+    def __keep(self: Log, level: str) -> bool:
+        p = self.__sample.get(level)
+        if p is not None and random.random() >= p:
+            self.__drop()
+            return False
+        r = self.__rate.get(level)
+        if r is None:
+            return True
+        with self.__lock:
+            now = time.monotonic()
+            tokens, last = self.__buckets.get(level, (r, now))
+            tokens = min(r, tokens + (now - last) * r)
+            if tokens < 1:
+                self.__buckets[level] = (tokens, now)
+                self.__dropped += 1
+                return False
+            self.__buckets[level] = (tokens - 1, now)
+        return True
+
+    def __enqueue(self: Log, sink: int, message: str) -> None:
+        try:
+            self.__queue.put_nowait((sink, str(message)))
+        except Full:
+            self.__drop()
+
+    def __drop(self: Log) -> None:
+        with self.__lock:
+            self.__dropped += 1
+
+    def __after_fork(self: Log) -> None:
+        # a forked child has the parent's queue but not its writer thread
+        self.__lock = Lock()
+        if self.__queue is not None:
+            self.__queue = Queue(maxsize=self.__queue.maxsize)
+            self.__start_writer()
+
+    def __start_writer(self: Log) -> None:
+        self.__writer = Thread(target=self.__write, args=(self.__queue,))
+        self.__writer.daemon = True
+        self.__writer.start()
+
+    def __write(self: Log, queue: Queue) -> None:
+        while (item := queue.get()) is not None:
+            sink, message = item
+            self.__log.bind(sink=sink).opt(raw=True).log("DEBUG", message)
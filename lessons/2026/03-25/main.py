@@ -1,10 +1,26 @@
+import json
+
 import click
+from bridge import connect
 from client import Client
 from config import Config
+from loadgen import PROTOCOLS, LoadGenerator
 from logger import Log
+from outbound import SlowConsumerPolicy
 from server import Server
+from server_async import AsyncServer
+from server_cluster import ClusterServer
+from server_selector import SelectorServer
+from tls import client_context, server_context
 from ui import UI
 
+SERVER_MODES = {
+    "thread": Server,
+    "selector": SelectorServer,
+    "asyncio": AsyncServer,
+    "cluster": ClusterServer,
+}
+
 
 @click.group()
 def cli():
@@ -22,19 +38,49 @@ def cli():
     "-s", "--host", help="Hostname (or IP) of the YACR Server", type=str
 )
 @click.option("-p", "--port", help="TCP port of the YACR Server", type=int)
-def start_client(config: str, name: str, host: str, port: int) -> None:
+@click.option("--path", help="Unix socket of the YACR Server (same host)")
+@click.option("--scrollback", help="Lines kept in the chat window", type=int)
+@click.option("--downloads", help="Directory of the files you accept")
+@click.option("--tls", help="Connect with TLS", is_flag=True)
+@click.option("--tls-ca", help="CA certificate that signed the server certificate")
+def start_client(
+    config: str,
+    name: str,
+    host: str,
+    port: int,
+    path: str,
+    scrollback: int,
+    downloads: str,
+    tls: bool,
+    tls_ca: str,
+) -> None:
     log: Log = Log(filename="log/yacr-client.log")
 
     cfg: Config = Config(
         log=log,
         path=config,
-        data={"name": name, "server": {"host": host, "port": port}},
+        data={
+            "name": name,
+            "scrollback": scrollback,
+            "downloads": downloads,
+            "server": {
+                "host": host,
+                "port": port,
+                "path": path,
+                "tls": {"ca": tls_ca} if tls or tls_ca else None,
+            },
+        },
     )
 
-    client: Client = Client(log=log)
-    client.start(name=cfg.name, host=cfg.host, port=cfg.port)
+    client: Client = Client(
+        log=log,
+        path=cfg.path,
+        tls=client_context(**cfg.tls) if cfg.tls is not None else None,
+        downloads=cfg.downloads,
+    )
+    client.start(name=cfg.name, **cfg.address)
 
-    ui: UI = UI(socket=client, log=log, name=cfg.name)
+    ui: UI = UI(socket=client, log=log, name=cfg.name, scrollback=cfg.scrollback)
     ui.run()
 
 
@@ -48,17 +94,267 @@ def start_client(config: str, name: str, host: str, port: int) -> None:
     "-s", "--host", help="Hostname (or IP) of the YACR Server", type=str
 )
 @click.option("-p", "--port", help="TCP port of the YACR Server", type=int)
-def start_server(config: str, host: str, port: int) -> None:
+@click.option("--path", help="Unix socket to listen on instead of host and port")
+@click.option(
+    "-m",
+    "--mode",
+    help="Concurrency model of the YACR Server",
+    type=click.Choice(list(SERVER_MODES)),
+    default="thread",
+    show_default=True,
+)
+@click.option(
+    "-q", "--queue-size", help="Outbound queue size for each client", type=int
+)
+@click.option(
+    "--slow-consumer",
+    help="What to do when the outbound queue of a client is full",
+    type=click.Choice([p.value for p in SlowConsumerPolicy]),
+)
+@click.option(
+    "-w",
+    "--workers",
+    help="Worker processes sharing the port (cluster mode)",
+    type=int,
+)
+@click.option("--backlog", help="Backlog of the listening socket", type=int)
+@click.option(
+    "--heartbeat",
+    help="Seconds of silence before a client is pinged (thread mode)",
+    type=float,
+)
+@click.option(
+    "--idle-timeout",
+    help="Seconds of silence before a client is closed (thread mode)",
+    type=float,
+)
+@click.option(
+    "--history-size",
+    help="Messages of each room replayed to new members (thread mode)",
+    type=int,
+)
+@click.option(
+    "--spool", help="Directory of the files offered by the clients (thread mode)"
+)
+@click.option(
+    "--resume-grace",
+    help="Seconds a disconnected session can be resumed (thread mode)",
+    type=float,
+)
+@click.option(
+    "--resume-buffer",
+    help="Unacked messages kept for each session (thread mode)",
+    type=int,
+)
+@click.option(
+    "--admin-port",
+    help="Local port of the JSON stats endpoint (thread mode)",
+    type=int,
+)
+@click.option(
+    "--admin-path", help="Unix socket of the JSON stats endpoint (thread mode)"
+)
+@click.option(
+    "--bridge",
+    help="Redis (redis://host:port) sharing the lobby with other servers (thread mode)",
+)
+@click.option("--tls-cert", help="Certificate of the server (enables TLS)")
+@click.option("--tls-key", help="Private key of the server certificate")
+@click.option("--tls-ca", help="Accept only clients with a certificate signed by it")
+@click.option(
+    "--handshake-workers",
+    help="Threads running the TLS handshakes (selector and cluster modes)",
+    type=int,
+)
+@click.option(
+    "--log-async",
+    help="Write the log from a background thread",
+    is_flag=True,
+    default=None,
+)
+@click.option(
+    "--log-json", help="Write the log as JSON records", is_flag=True, default=None
+)
+def start_server(
+    config: str,
+    host: str,
+    port: int,
+    path: str,
+    mode: str,
+    queue_size: int,
+    slow_consumer: str,
+    workers: int,
+    backlog: int,
+    heartbeat: float,
+    idle_timeout: float,
+    history_size: int,
+    spool: str,
+    resume_grace: float,
+    resume_buffer: int,
+    admin_port: int,
+    admin_path: str,
+    bridge: str,
+    tls_cert: str,
+    tls_key: str,
+    tls_ca: str,
+    handshake_workers: int,
+    log_async: bool,
+    log_json: bool,
+) -> None:
     log: Log = Log(filename="log/yacr-server.log")
 
     cfg: Config = Config(
         log=log,
         path=config,
-        data={"server": {"host": host, "port": port}},
+        data={
+            "server": {
+                "host": host,
+                "port": port,
+                "path": path,
+                "queue_size": queue_size,
+                "slow_consumer": slow_consumer,
+                "workers": workers,
+                "backlog": backlog,
+                "heartbeat": heartbeat,
+                "idle_timeout": idle_timeout,
+                "history_size": history_size,
+                "spool": spool,
+                "resume_grace": resume_grace,
+                "resume_buffer": resume_buffer,
+                "admin_port": admin_port,
+                "admin_path": admin_path,
+                "bridge": bridge,
+                "handshake_workers": handshake_workers,
+                "tls": (
+                    {"cert": tls_cert, "key": tls_key, "ca": tls_ca}
+                    if tls_cert is not None
+                    else None
+                ),
+            },
+            "logging": {"asynchronous": log_async, "json": log_json},
+        },
+    )
+    log.configure(**cfg.logging)
+
+    options = {
+        "queue_size": cfg.queue_size,
+        "policy": cfg.slow_consumer,
+        "backlog": cfg.backlog,
+    }
+    if mode == "cluster":
+        options["workers"] = cfg.workers
+    if mode == "thread":
+        options["heartbeat"] = cfg.heartbeat
+        options["idle_timeout"] = cfg.idle_timeout
+        options["history_size"] = cfg.history_size
+        options["spool"] = cfg.spool
+        options["resume_grace"] = cfg.resume_grace
+        options["resume_buffer"] = cfg.resume_buffer
+        options["admin_port"] = cfg.admin_port
+        options["admin_path"] = cfg.admin_path
+    if cfg.bridge is not None:
+        if mode != "thread":
+            log.exception("The Redis bridge is available in the thread mode")
+        try:
+            options["broker"] = connect(cfg.bridge)
+        except ImportError as imp_err:
+            log.exception("Redis bridge not available", error=imp_err)
+    if cfg.path is not None:
+        if mode not in ("thread", "selector"):
+            log.exception("Unix sockets are available in the thread and selector modes")
+        options["path"] = cfg.path
+    if cfg.tls is not None:
+        if mode not in ("selector", "cluster"):
+            log.exception("TLS is available in the selector and cluster modes")
+        if "cert" not in cfg.tls or "key" not in cfg.tls:
+            log.exception("TLS needs the certificate and the key of the server")
+        options["tls"] = server_context(**cfg.tls)
+        options["handshake_workers"] = cfg.handshake_workers
+    server: Server | SelectorServer | AsyncServer | ClusterServer = SERVER_MODES[
+        mode
+    ](log=log, **options)
+    server.start(**cfg.address)
+
+
+@cli.command("bench")
+@click.option(
+    "-c",
+    "--config",
+    help="The configuration file must be in YAML format",
+)
+@click.option(
+    "-s", "--host", help="Hostname (or IP) of the YACR Server", type=str
+)
+@click.option("-p", "--port", help="TCP port of the YACR Server", type=int)
+@click.option(
+    "-n", "--clients", help="Simulated clients", default=100, show_default=True
+)
+@click.option(
+    "-r",
+    "--rate",
+    help="Messages per second sent by all the clients together",
+    default=1000.0,
+    show_default=True,
+)
+@click.option(
+    "-d", "--duration", help="Seconds of load", default=10.0, show_default=True
+)
+@click.option(
+    "--size", help="Padding bytes added to each message", default=64, show_default=True
+)
+@click.option(
+    "--protocol",
+    help="Wire protocol of the server (raw for the unframed lessons)",
+    type=click.Choice(PROTOCOLS),
+    default="framed",
+    show_default=True,
+)
+@click.option("--tls", help="Connect with TLS", is_flag=True)
+@click.option("--tls-ca", help="CA certificate that signed the server certificate")
+@click.option("-o", "--output", help="Write the JSON results to this file")
+def start_bench(
+    config: str,
+    host: str,
+    port: int,
+    clients: int,
+    rate: float,
+    duration: float,
+    size: int,
+    protocol: str,
+    tls: bool,
+    tls_ca: str,
+    output: str,
+) -> None:
+    log: Log = Log()
+
+    cfg: Config = Config(
+        log=log,
+        path=config,
+        data={
+            "server": {
+                "host": host,
+                "port": port,
+                "tls": {"ca": tls_ca} if tls or tls_ca else None,
+            }
+        },
     )
 
-    server: Server = Server(log=log)
-    server.start(host=cfg.host, port=cfg.port)
+    bench: LoadGenerator = LoadGenerator(
+        log=log,
+        clients=clients,
+        rate=rate,
+        duration=duration,
+        size=size,
+        protocol=protocol,
+        tls=client_context(**cfg.tls) if cfg.tls is not None else None,
+    )
+    results = json.dumps(bench.start(host=cfg.host, port=cfg.port), indent=2)
+    if output is not None:
+        with open(output, "w") as f:
+            f.write(results)
+        log.success(f"Results written to {output}")
+    else:
+        print(results)
 
 
 if __name__ == "__main__":
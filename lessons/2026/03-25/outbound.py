@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from collections import deque
+from enum import Enum
+from threading import Condition
+from typing import Deque, Dict, List, Optional
+
+DEFAULT_QUEUE_SIZE: int = 1024
+# frames handed to a single sendmsg call, well below IOV_MAX
+MAX_BATCH: int = 64
+# seconds between two logs of the clients with frames waiting in their queue
+QUEUE_REPORT_INTERVAL: float = 10
+
+
+class SlowConsumerPolicy(str, Enum):
+    DROP_OLDEST = "drop-oldest"
+    DROP_NEWEST = "drop-newest"
+    DISCONNECT = "disconnect"
+
+
+class OutboundQueue:
+    def __init__(
+        self: OutboundQueue,
+        size: int = DEFAULT_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST,
+    ) -> None:
+        self.__frames: Deque[bytes] = deque()
+        self.__size: int = size
+        self.__policy: SlowConsumerPolicy = SlowConsumerPolicy(policy)
+        self.__ready: Condition = Condition()
+        self.__closed: bool = False
+        self.dropped: int = 0
+
+    @property
+    def depth(self: OutboundQueue) -> int:
+        return len(self.__frames)
+
+    @property
+    def closed(self: OutboundQueue) -> bool:
+        return self.__closed
+
+    def put(self: OutboundQueue, frame: bytes) -> bool:
+        with self.__ready:
+            if self.__closed:
+                return False
+            if len(self.__frames) >= self.__size:
+                if self.__policy == SlowConsumerPolicy.DISCONNECT:
+                    return False
+                self.dropped += 1
+                if self.__policy == SlowConsumerPolicy.DROP_NEWEST:
+                    return True
+                self.__frames.popleft()
+            self.__frames.append(frame)
+            self.__ready.notify()
+            return True
+
+    def get_batch(self: OutboundQueue, limit: int = MAX_BATCH) -> List[bytes]:
+        with self.__ready:
+            while not self.__frames and not self.__closed:
+                self.__ready.wait()
+            return self.__take(limit)
+
+    def pop_batch(self: OutboundQueue, limit: int = MAX_BATCH) -> List[bytes]:
+        with self.__ready:
+            return self.__take(limit)
+
+    def close(self: OutboundQueue) -> None:
+        with self.__ready:
+            self.__closed = True
+            self.__frames.clear()
+            self.__ready.notify_all()
+
+    def __take(self: OutboundQueue, limit: int) -> List[bytes]:
+        # an empty batch means there is nothing to send (or the queue is closed)
+        if self.__closed:
+            return []
+        n = min(limit, len(self.__frames))
+        return [self.__frames.popleft() for _ in range(n)]
+
+
+def laggards(depths: Dict[str, int]) -> Optional[str]:
+    # "bob 812, carol 40": the deepest queues first, None when all are empty
+    waiting = sorted((d, n) for n, d in depths.items() if d > 0)
+    return ", ".join(f"{n} {d}" for d, n in reversed(waiting)) or None
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import Dict, Generic, Hashable, Optional, Set, TypeVar
+
+DEFAULT_ROOM: str = "lobby"
+
+Connection = TypeVar("Connection", bound=Hashable)
+
+
+class RoomIndex(Generic[Connection]):
+    def __init__(self: RoomIndex) -> None:
+        # room -> members and member -> rooms, so fan-out and leave are O(room)
+        self.__members: Dict[str, Set[Connection]] = {}
+        self.__rooms: Dict[Connection, Set[str]] = {}
+        # name -> connection for direct messages
+        self.__connections: Dict[str, Connection] = {}
+
+    def add(self: RoomIndex, connection: Connection, name: str) -> None:
+        self.__rooms[connection] = set()
+        self.__connections[name.lower()] = connection
+        self.join(connection, DEFAULT_ROOM)
+
+    def remove(self: RoomIndex, connection: Connection, name: str) -> Set[str]:
+        rooms = self.__rooms.pop(connection, set())
+        for room in rooms:
+            self.__discard(connection, room)
+        if self.__connections.get(name.lower()) is connection:
+            del self.__connections[name.lower()]
+        return rooms
+
+    def move(self: RoomIndex, old: Connection, new: Connection, name: str) -> None:
+        # a resumed session goes on over a new connection, in the same rooms
+        rooms = self.__rooms.pop(old, set())
+        self.__rooms[new] = rooms
+        for room in rooms:
+            self.__members[room].discard(old)
+            self.__members[room].add(new)
+        if self.__connections.get(name.lower()) is old:
+            self.__connections[name.lower()] = new
+
+    def join(self: RoomIndex, connection: Connection, room: str) -> bool:
+        if room in self.__rooms[connection]:
+            return False
+        self.__rooms[connection].add(room)
+        self.__members.setdefault(room, set()).add(connection)
+        return True
+
+    def leave(self: RoomIndex, connection: Connection, room: str) -> bool:
+        if room not in self.__rooms[connection]:
+            return False
+        self.__rooms[connection].remove(room)
+        self.__discard(connection, room)
+        return True
+
+    def members(self: RoomIndex, room: str) -> Set[Connection]:
+        return self.__members.get(room, set())
+
+    def rooms(self: RoomIndex, connection: Connection) -> Set[str]:
+        return self.__rooms.get(connection, set())
+
+    def lookup(self: RoomIndex, name: str) -> Optional[Connection]:
+        return self.__connections.get(name.lower())
+
+    def __discard(self: RoomIndex, connection: Connection, room: str) -> None:
+        members = self.__members[room]
+        members.discard(connection)
+        if not members:
+            del self.__members[room]
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from collections import deque
+from threading import Lock
+from typing import Deque, Optional
+
+DEFAULT_SCROLLBACK: int = 1000
+DEFAULT_FPS: int = 30
+
+
+class Scrollback:
+    def __init__(
+        self: Scrollback, text: str = "", lines: int = DEFAULT_SCROLLBACK
+    ) -> None:
+        # append-only, the oldest lines fall off once the cap is reached
+        self.__lines: Deque[str] = deque(text.splitlines(), maxlen=lines)
+        self.__lock: Lock = Lock()
+        self.__dirty: bool = True
+
+    def append(self: Scrollback, line: str) -> None:
+        with self.__lock:
+            self.__lines.append(line)
+            self.__dirty = True
+
+    def render(self: Scrollback) -> Optional[str]:
+        # the text to show, None when nothing changed since the last render
+        with self.__lock:
+            if not self.__dirty:
+                return None
+            self.__dirty = False
+            return "\n".join(self.__lines)
@@ -1,67 +1,792 @@
 from __future__ import annotations
 
+import json
+import time
 from datetime import datetime
-from socket import SO_REUSEADDR, SOL_SOCKET
+from socket import SHUT_RDWR, SO_REUSEADDR, SOL_SOCKET
 from socket import socket as Socket
-from threading import Thread
-from typing import List
+from threading import Event, Lock, Thread, active_count
+from typing import Dict, Iterable, Optional, Set
 
+from bridge import Bridge
+from codec import Envelope
+from history import DEFAULT_HISTORY_SIZE, History
 from logger import Log
-from socket_extended import DEFAULT_HOST, DEFAULT_PORT, SocketExtended
+from outbound import (
+    DEFAULT_QUEUE_SIZE,
+    QUEUE_REPORT_INTERVAL,
+    OutboundQueue,
+    SlowConsumerPolicy,
+    laggards,
+)
+from rooms import DEFAULT_ROOM, RoomIndex
+from session import DEFAULT_RESUME_BUFFER, DEFAULT_RESUME_GRACE, Session
+from socket_extended import (
+    DEFAULT_BACKLOG,
+    DEFAULT_HEARTBEAT,
+    DEFAULT_HOST,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_PORT,
+    HEADER,
+    MAX_MESSAGE_SIZE,
+    MAX_NAME_SIZE,
+    MAX_PAYLOAD_SIZE,
+    SEQUENCE,
+    FrameBuffer,
+    FrameError,
+    FrameType,
+    SocketExtended,
+    encode_frame,
+    sendall_frames,
+    set_keepalive,
+)
+from stats import DEFAULT_ADMIN_HOST, Histogram, Rates, Traffic
+from transfer import (
+    DEFAULT_SPOOL,
+    MAX_FILE_SIZE,
+    Offer,
+    Spool,
+    receive_file,
+    send_file,
+)
+
+PING: bytes = encode_frame(FrameType.PING)
 
 
 class Server(SocketExtended):
 
-    def __init__(self: SocketExtended, log: Log) -> None:
-        super().__init__(log)
+    def __init__(
+        self: SocketExtended,
+        log: Log,
+        path: str = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST,
+        backlog: int = DEFAULT_BACKLOG,
+        heartbeat: float = DEFAULT_HEARTBEAT,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+        spool: str = DEFAULT_SPOOL,
+        resume_grace: float = DEFAULT_RESUME_GRACE,
+        resume_buffer: int = DEFAULT_RESUME_BUFFER,
+        admin_port: int = None,
+        admin_path: str = None,
+        broker: any = None,
+    ) -> None:
+        super().__init__(log, path=path)
+        self.__queue_size: int = queue_size
+        self.__policy: SlowConsumerPolicy = SlowConsumerPolicy(policy)
+        self.__backlog: int = backlog
+        self.__heartbeat: float = heartbeat
+        self.__idle_timeout: float = idle_timeout
+        self.__history_size: int = history_size
+        self.__resume_grace: float = resume_grace
+        self.__resume_buffer: int = resume_buffer
+        self.__admin_port: int = admin_port
+        self.__admin_path: str = admin_path
+        self.__queues: Dict[Socket, OutboundQueue] = {}
+        self.__names: Dict[Socket, str] = {}
+        self.__rooms: RoomIndex[Socket] = RoomIndex()
+        # room where plain messages of each client are sent
+        self.__current: Dict[Socket, str] = {}
+        # recent messages of each room, replayed to the clients joining it
+        self.__history: Dict[str, History] = {}
+        # files offered by a client to another one, until they expire
+        self.__spool: Spool = Spool(spool)
+        # monotonic time of the last frame received from each client
+        self.__seen: Dict[Socket, float] = {}
+        # resumable sessions by token and by connection; a detached session
+        # keeps its closed connection in the rooms until it resumes or expires
+        self.__sessions: Dict[str, Session] = {}
+        self.__session_of: Dict[Socket, Session] = {}
+        self.__counters: Dict[str, int] = {
+            "accepted": 0,
+            "rejected": 0,
+            "closed": 0,
+            "reaped": 0,
+            "slow": 0,
+            "resumed": 0,
+        }
+        # bytes and frames of each connection, and of the closed ones
+        self.__traffic: Dict[Socket, Traffic] = {}
+        self.__retired: Traffic = Traffic()
+        # time taken by a broadcast to reach the queues of all the recipients,
+        # only measured when the admin endpoint can show it
+        self.__fanout: Optional[Histogram] = (
+            Histogram() if admin_port is not None or admin_path is not None else None
+        )
+        self.__rates: Rates = Rates()
+        self.__started: float = time.monotonic()
+        # lobby shared with the servers and the Redis clients on the broker
+        self.__bridge: Optional[Bridge] = (
+            Bridge(log, broker, self.__inject) if broker is not None else None
+        )
+        self.__lock: Lock = Lock()
+        self.__stopped: Event = Event()
+
+    def queue_depths(self: Server) -> Dict[str, int]:
+        with self.__lock:
+            return {self.__names[s]: q.depth for s, q in self.__queues.items()}
+
+    def counters(self: Server) -> Dict[str, int]:
+        with self.__lock:
+            return {"active": len(self.__queues), **self.__counters}
+
+    def stats(self: Server) -> Dict[str, any]:
+        # snapshot served by the admin endpoint
+        counters = self.counters()
+        total = Traffic()
+        with self.__lock:
+            total.add(self.__retired)
+            clients = []
+            for s, q in self.__queues.items():
+                traffic = self.__traffic.get(s, Traffic())
+                total.add(traffic)
+                clients.append(
+                    {
+                        "name": self.__names[s],
+                        "room": self.__current.get(s),
+                        "queue": q.depth,
+                        "dropped": q.dropped,
+                        **traffic.as_dict(),
+                    }
+                )
+            detached = sum(1 for s in self.__sessions.values() if s.detached)
+        return {
+            "uptime": round(time.monotonic() - self.__started, 1),
+            "connections": counters,
+            "sessions": {"open": len(self.__sessions), "detached": detached},
+            "traffic": total.as_dict(),
+            "messages_per_sec": self.__rates.rates(),
+            "fanout_latency": self.__fanout.snapshot() if self.__fanout else {},
+            "threads": active_count(),
+            "clients": clients,
+        }
 
     def start(
         self: Server,
         host: str = DEFAULT_HOST,
         port: int = DEFAULT_PORT,
     ) -> None:
-        self._socket.bind((host, port))
-        self._socket.listen(5)
+        self._bind(host, port)
+        self._socket.listen(self.__backlog)
         self._socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
         self.__host: str = host
         self.__port: int = port
-        self.__client_sockets: List[Socket] = []
+        r: Thread = Thread(target=self.__reap)
+        r.daemon = True
+        r.start()
+        q: Thread = Thread(target=self.__report)
+        q.daemon = True
+        q.start()
+        if self.__admin_port is not None or self.__admin_path is not None:
+            self.__admin()
+        if self.__bridge is not None:
+            self.__bridge.start()
+        try:
+            self.__accept(self._where(host, port))
+        finally:
+            self.__stopped.set()
+
+    def __accept(self: Server, where: str) -> None:
         while True:
-            self._log.info(f"Waiting for incoming connection at {host}:{port}")
+            self._log.info(f"Waiting for incoming connection at {where}")
             client_socket, _ = self._socket.accept()
-            self.__client_sockets.append(client_socket)
-            client_name = client_socket.recv(200).decode()
-            d = datetime.now()
-            message = f"{client_name} ({d}) joined the chat"
-            self._log.success(message)
-            self.__dispatch_to_others(message)
+            set_keepalive(client_socket)
+            # the first frame is read by the thread of the connection: a silent
+            # client must not block the accept loop
             t: Thread = Thread(
-                target=self.__process,
-                kwargs={"name": client_name, "socket": client_socket},
+                target=self.__handshake, kwargs={"socket": client_socket}
             )
             t.daemon = True
             t.start()
 
-    def __process(self: Server, name: str, socket: Socket) -> None:
+    def __handshake(self: Server, socket: Socket) -> None:
+        # NAME joins the chat, SESSION resumes one, UPLOAD/DOWNLOAD open a
+        # data connection; the idle timeout applies until the first frame
+        socket.settimeout(self.__idle_timeout)
+        frames: FrameBuffer = FrameBuffer()
+        try:
+            frame = frames.read(socket)
+        except (FrameError, OSError):
+            frame = None
+        if frame is not None and frame[0] in (FrameType.UPLOAD, FrameType.DOWNLOAD):
+            # data connection of a file transfer, moved by this thread with the
+            # idle timeout still set: a slow uploader only holds its own thread
+            self.__transfer(socket, frame[0], frame[1])
+            return
+        if frame is not None and frame[0] == FrameType.SESSION:
+            self.__resume(socket, frames, frame[1])
+            return
+        if frame is None or frame[0] != FrameType.NAME or len(frame[1]) > MAX_NAME_SIZE:
+            with self.__lock:
+                self.__counters["rejected"] += 1
+            socket.close()
+            return
+        socket.settimeout(None)
+        client_name = frame[1].decode(errors="replace")
+        queue: OutboundQueue = OutboundQueue(self.__queue_size, self.__policy)
+        traffic: Traffic = Traffic()
+        with self.__lock:
+            # direct messages go by name: a second alice would take them over
+            taken = self.__rooms.lookup(client_name) is not None
+            if taken:
+                self.__counters["rejected"] += 1
+            else:
+                self.__queues[socket] = queue
+                self.__traffic[socket] = traffic
+                self.__names[socket] = client_name
+                self.__rooms.add(socket, client_name)
+                self.__current[socket] = DEFAULT_ROOM
+                self.__seen[socket] = time.monotonic()
+                self.__counters["accepted"] += 1
+        if taken:
+            self._log.warning(f"{client_name} refused: the name is already in use")
+            reply = f"The name {client_name} is already in use, choose another one"
+            try:
+                socket.sendall(encode_frame(FrameType.MESSAGE, reply.encode()))
+            except OSError:
+                pass
+            socket.close()
+            return
+        w: Thread = Thread(
+            target=self.__deliver,
+            kwargs={"socket": socket, "queue": queue, "traffic": traffic},
+        )
+        w.daemon = True
+        w.start()
+        d = datetime.now()
+        message = f"{client_name} ({d}) joined the chat"
+        self._log.success(message)
+        self.__replay(socket, DEFAULT_ROOM)
+        self.__dispatch_to_room(message, DEFAULT_ROOM)
+        self.__bridged(client_name, "!", "joins the chat")
+        # from now on, this is the thread reading the frames of the client
+        self.__process(client_name, socket, frames, traffic)
+
+    def __process(
+        self: Server,
+        name: str,
+        socket: Socket,
+        frames: FrameBuffer,
+        traffic: Traffic,
+    ) -> None:
         while True:
-            msg = socket.recv(200).decode()
-            if msg == "end":
-                self.__client_sockets.remove(socket)
-                socket.close()
+            try:
+                frame = frames.read(socket)
+            except (FrameError, OSError):
+                frame = None
+            if frame is None or frame[0] == FrameType.END:
+                recipients = self.__remove(socket, name, frame is not None)
                 break
-            else:
-                d = datetime.now()
-                self._log.success(f'{name} sends the message "{msg}"')
-                self.__dispatch_to_others(f"{name} ({d})> {msg}")
+            traffic.frames_in += 1
+            traffic.bytes_in += HEADER.size + len(frame[1])
+            with self.__lock:
+                self.__seen[socket] = time.monotonic()
+            if frame[0] == FrameType.MESSAGE:
+                traffic.messages_in += 1
+                if len(frame[1]) > MAX_MESSAGE_SIZE:
+                    self.__reply(
+                        socket, f"Messages up to {MAX_MESSAGE_SIZE} bytes can be sent"
+                    )
+                    continue
+                try:
+                    self.__command(name, socket, frame[1].decode(errors="replace"))
+                except FrameError as frame_err:
+                    # still too long once the server added the room (a long
+                    # room name): the client goes, with the usual cleanup
+                    self._log.warning(f"{name} disconnected: {frame_err}")
+                    recipients = self.__remove(socket, name)
+                    break
+            elif frame[0] == FrameType.ACK:
+                self.__ack(socket, frame[1])
+            elif frame[0] == FrameType.SESSION:
+                self.__open_session(name, socket)
+            elif frame[0] == FrameType.OFFER:
+                self.__offer(name, socket, frame[1])
+        if recipients is not None:
+            self.__leave(name, recipients)
+
+    def __leave(self: Server, name: str, recipients: Set[Socket]) -> None:
         msg = f"{name} leaves the chat"
         self._log.warning(msg)
         d = datetime.now()
         msg = f"{name} ({d}) leaves the chat"
-        self.__dispatch_to_others(msg)
+        self.__dispatch_to(msg, recipients)
+        self.__bridged(name, "!", "leaves the chat")
+
+    def __bridged(self: Server, name: str, type: str, message: str) -> None:
+        # types of the Redis YACR: ">" message, "!" joins or leaves
+        if self.__bridge is not None:
+            self.__bridge.publish(name, type, message)
+
+    def __inject(self: Server, envelope: Envelope) -> None:
+        # lobby message of another server or of a Redis client
+        name, type, text = envelope["name"], envelope["type"], envelope["message"]
+        d = datetime.fromtimestamp(envelope["time"] / 1000)
+        if type == ">":
+            self._log.success(f'{name} sends the message "{text}" via the bridge')
+            self.__publish(f"{name} ({d})> {text}", DEFAULT_ROOM)
+        else:
+            self.__dispatch_to_room(f"{name} ({d}) {text}", DEFAULT_ROOM)
+
+    def __open_session(self: Server, name: str, socket: Socket) -> None:
+        with self.__lock:
+            queue = self.__queues.get(socket)
+            if queue is None:
+                return
+            session = self.__session_of.get(socket)
+            if session is None:
+                session = Session(socket, name, queue, self.__resume_buffer)
+                self.__sessions[session.token] = session
+                self.__session_of[socket] = session
+            # from now on the messages of this client are numbered: the reply
+            # is queued under the lock, so it comes before the first of them
+            reply = {"token": session.token, "grace": self.__resume_grace}
+            payload = json.dumps(reply).encode()
+            queue.put(encode_frame(FrameType.SESSION, payload))
+
+    def __ack(self: Server, socket: Socket, payload: bytes) -> None:
+        with self.__lock:
+            session = self.__session_of.get(socket)
+        if session is not None and payload.isdigit():
+            with session.lock:
+                session.ack(int(payload))
+
+    def __resume(
+        self: Server, socket: Socket, frames: FrameBuffer, payload: bytes
+    ) -> None:
+        # {"token": token, "ack": last sequence received}
+        try:
+            request = json.loads(payload)
+            token, ack = request["token"], int(request.get("ack", 0))
+        except (ValueError, KeyError, TypeError):
+            token, ack = None, 0
+        socket.settimeout(None)
+        queue: OutboundQueue = OutboundQueue(self.__queue_size, self.__policy)
+        traffic: Traffic = Traffic()
+        with self.__lock:
+            session = self.__sessions.get(token)
+            if session is not None:
+                old = session.socket
+                # the old connection may still look open (half-open TCP)
+                taken = self.__queues.pop(old, None)
+                self.__seen.pop(old, None)
+                self.__rooms.move(old, socket, session.name)
+                self.__names[socket] = self.__names.pop(old)
+                self.__current[socket] = self.__current.pop(old)
+                self.__session_of[socket] = self.__session_of.pop(old)
+                self.__queues[socket] = queue
+                self.__traffic[socket] = traffic
+                self.__seen[socket] = time.monotonic()
+                self.__counters["resumed"] += 1
+                session.socket = socket
+                session.detached = None
+                # queued under the lock of the session, so they come before
+                # any new message
+                with session.lock:
+                    session.queue = queue
+                    session.ack(ack)
+                    replay, lost = session.since(ack)
+                    reply = {"token": session.token, "resumed": True, "lost": lost}
+                    payload = json.dumps(reply).encode()
+                    queue.put(encode_frame(FrameType.SESSION, payload))
+                    for frame in replay:
+                        queue.put(frame)
+        if session is None:
+            # unknown or expired: the client has to join again
+            try:
+                socket.sendall(encode_frame(FrameType.END, b"Session expired"))
+            except OSError:
+                pass
+            socket.close()
+            return
+        if taken is not None:
+            taken.close()
+            self.__shutdown(old)
+        self._log.info(f"{session.name} resumed the session ({len(replay)} replayed)")
+        w: Thread = Thread(
+            target=self.__deliver,
+            kwargs={"socket": socket, "queue": queue, "traffic": traffic},
+        )
+        w.daemon = True
+        w.start()
+        self.__process(session.name, socket, frames, traffic)
+
+    def __command(self: Server, name: str, socket: Socket, msg: str) -> None:
+        d = datetime.now()
+        command, _, arg = msg.partition(" ")
+        arg = arg.strip()
+        if command == "/join" and arg != "":
+            with self.__lock:
+                joined = self.__rooms.join(socket, arg)
+                self.__current[socket] = arg
+            if joined:
+                self._log.info(f"{name} joins #{arg}")
+                self.__replay(socket, arg)
+                self.__dispatch_to_room(f"{name} ({d}) joined #{arg}", arg)
+            else:
+                self.__reply(socket, f"Now talking in #{arg}")
+        elif command == "/leave" and arg != "":
+            with self.__lock:
+                left = self.__rooms.leave(socket, arg)
+                rooms = self.__rooms.rooms(socket)
+                if self.__current.get(socket) == arg:
+                    self.__current[socket] = next(iter(sorted(rooms)), None)
+            if not left:
+                self.__reply(socket, f"You are not in #{arg}")
+                return
+            self._log.info(f"{name} leaves #{arg}")
+            self.__reply(socket, f"You left #{arg}")
+            self.__dispatch_to_room(f"{name} ({d}) left #{arg}", arg)
+        elif command == "/room":
+            with self.__lock:
+                rooms = sorted(self.__rooms.rooms(socket))
+                if arg in rooms:
+                    self.__current[socket] = arg
+                current = self.__current.get(socket)
+            if arg != "" and arg not in rooms:
+                self.__reply(socket, f"You are not in #{arg}, /join it first")
+                return
+            if current is None:
+                self.__reply(socket, "You are not in any room, /join one first")
+                return
+            listing = " ".join(f"#{r}" for r in rooms)
+            self.__reply(socket, f"Talking in #{current}, rooms: {listing}")
+        elif command == "/history":
+            # /history [room] [sequence]: the messages of room after sequence
+            room, since = None, 0
+            for a in arg.split():
+                if a.isdigit():
+                    since = int(a)
+                else:
+                    room = a
+            with self.__lock:
+                if room is None:
+                    room = self.__current.get(socket)
+                member = room in self.__rooms.rooms(socket)
+            if room is None:
+                self.__reply(socket, "You are not in any room, /join one first")
+                return
+            if not member:
+                self.__reply(socket, f"You are not in #{room}, /join it first")
+                return
+            self.__replay(socket, room, since)
+        elif msg.startswith("@"):
+            target, _, text = msg[1:].partition(" ")
+            with self.__lock:
+                peer = self.__rooms.lookup(target)
+            if peer is None:
+                self.__reply(socket, f"{target} is not in the chat")
+                return
+            self._log.success(f'{name} sends the direct message "{text}" to {target}')
+            self.__dispatch_to(f"{name} ({d}) @{target}> {text}", {peer, socket})
+        else:
+            with self.__lock:
+                room = self.__current.get(socket)
+            if room is None:
+                self.__reply(socket, "You are not in any room, /join one first")
+                return
+            self._log.success(f'{name} sends the message "{msg}" to #{room}')
+            self.__publish(f"{name} ({d})> {msg}", room)
+            if room == DEFAULT_ROOM:
+                self.__bridged(name, ">", msg)
 
-    def __dispatch_to_others(self: Server, message: str) -> None:
-        for client_socket in self.__client_sockets:
+    def __offer(self: Server, name: str, socket: Socket, payload: bytes) -> None:
+        # {"to": name, "name": file name, "size": bytes, "ref": any}
+        try:
+            request = json.loads(payload)
+            target, file, size = request["to"], request["name"], int(request["size"])
+        except (ValueError, KeyError, TypeError):
+            self.__reply(socket, "Malformed file offer")
+            return
+        with self.__lock:
+            peer = self.__rooms.lookup(target)
+        if peer is None:
+            self.__reply(socket, f"{target} is not in the chat")
+            return
+        if not 0 <= size <= MAX_FILE_SIZE:
+            self.__reply(socket, f"Files up to {MAX_FILE_SIZE} bytes can be sent")
+            return
+        offer = self.__spool.offer(name, target, file, size)
+        self._log.info(f"{name} offers {offer.name} ({size} bytes) to {target}")
+        # the go-ahead: the client uploads the file with this id
+        reply = {"id": offer.id, "ref": request.get("ref")}
+        self.__dispatch_frame(
+            encode_frame(FrameType.OFFER, json.dumps(reply).encode()), [socket]
+        )
+
+    def __transfer(self: Server, socket: Socket, type: int, request: bytes) -> None:
+        # request: "id" for an UPLOAD, "id offset" for a DOWNLOAD
+        id, _, offset = request.decode(errors="replace").partition(" ")
+        try:
+            offer = self.__spool.get(id)
+            if offer is None:
+                socket.sendall(encode_frame(FrameType.END, b"Unknown transfer"))
+            elif type == FrameType.UPLOAD:
+                self.__upload(socket, offer)
+            else:
+                self.__download(socket, offer, int(offset or 0))
+        except (OSError, ValueError) as err:
+            self._log.warning(f"File transfer interrupted: {err}")
+        finally:
+            socket.close()
+
+    def __upload(self: Server, socket: Socket, offer: Offer) -> None:
+        # resumes after the bytes already spooled by a previous attempt
+        offset = self.__spool.received(offer.id)
+        socket.sendall(encode_frame(FrameType.UPLOAD, str(offset).encode()))
+        offset = receive_file(socket, self.__spool.path(offer.id), offset, offer.size)
+        if offset < offer.size:
+            self._log.warning(
+                f"Upload of {offer.name} stopped at {offset}/{offer.size} bytes"
+            )
+            return
+        self._log.success(f"{offer.sender} uploaded {offer.name} for {offer.target}")
+        with self.__lock:
+            target = self.__rooms.lookup(offer.target)
+            sender = self.__rooms.lookup(offer.sender)
+        # the target hears about the file once it is complete
+        notice = {
+            "id": offer.id,
+            "from": offer.sender,
+            "name": offer.name,
+            "size": offer.size,
+        }
+        self.__dispatch_frame(
+            encode_frame(FrameType.OFFER, json.dumps(notice).encode()),
+            [target] if target is not None else [],
+        )
+        if sender is not None:
+            self.__reply(sender, f"{offer.name} offered to {offer.target}")
+
+    def __download(self: Server, socket: Socket, offer: Offer, offset: int) -> None:
+        if self.__spool.received(offer.id) < offer.size:
+            socket.sendall(encode_frame(FrameType.END, b"Upload not complete"))
+            return
+        socket.sendall(encode_frame(FrameType.DOWNLOAD, str(offer.size).encode()))
+        offset = send_file(socket, self.__spool.path(offer.id), offset, offer.size)
+        self._log.info(f"{offer.name} sent to {offer.target} ({offset}/{offer.size})")
+
+    def __deliver(
+        self: Server, socket: Socket, queue: OutboundQueue, traffic: Traffic
+    ) -> None:
+        while frames := queue.get_batch():
+            # a numbered frame is its prefix and the message shared with the
+            # other recipients: both go to the same sendmsg
+            buffers = [b for f in frames for b in (f if isinstance(f, tuple) else (f,))]
             try:
-                client_socket.send(message.encode())
+                sendall_frames(socket, buffers)
+            except OSError:
+                self.__shutdown(socket)
+                break
+            traffic.frames_out += len(frames)
+            traffic.bytes_out += sum(len(b) for b in buffers)
+
+    def __admin(self: Server) -> None:
+        # JSON snapshot of stats() to every connection, e.g. nc 127.0.0.1 32002
+        admin: SocketExtended = SocketExtended(self._log, path=self.__admin_path)
+        admin._bind(DEFAULT_ADMIN_HOST, self.__admin_port)
+        admin._socket.listen(self.__backlog)
+        where = admin._where(DEFAULT_ADMIN_HOST, self.__admin_port)
+        self._log.info(f"Admin endpoint at {where}")
+        a: Thread = Thread(target=self.__serve_admin, kwargs={"admin": admin})
+        a.daemon = True
+        a.start()
+        s: Thread = Thread(target=self.__sample)
+        s.daemon = True
+        s.start()
+
+    def __serve_admin(self: Server, admin: SocketExtended) -> None:
+        while True:
+            admin_socket, _ = admin._socket.accept()
+            try:
+                admin_socket.sendall(json.dumps(self.stats(), indent=2).encode())
             except OSError:
                 pass
+            admin_socket.close()
+
+    def __sample(self: Server) -> None:
+        # messages received so far, once a second, for the messages per second
+        while not self.__stopped.wait(1):
+            with self.__lock:
+                total = self.__retired.messages_in + sum(
+                    t.messages_in for t in self.__traffic.values()
+                )
+            self.__rates.sample(total)
+
+    def __report(self: Server) -> None:
+        # the laggards: queue depths are in the stats too, but only with an admin
+        while not self.__stopped.wait(QUEUE_REPORT_INTERVAL):
+            if (report := laggards(self.queue_depths())) is not None:
+                self._log.warning(f"Outbound queue depths: {report}")
+
+    def __reap(self: Server) -> None:
+        # PINGs the silent clients and closes the ones idle past the timeout
+        logged: Dict[str, int] = {}
+        while not self.__stopped.wait(self.__heartbeat):
+            now = time.monotonic()
+            with self.__lock:
+                idle = [
+                    (s, self.__names[s], self.__queues[s], now - seen)
+                    for s, seen in self.__seen.items()
+                ]
+            for client_socket, name, queue, silence in idle:
+                if silence > self.__idle_timeout:
+                    self._log.warning(f"{name} idle for {silence:.0f}s, closing")
+                    with self.__lock:
+                        self.__counters["reaped"] += 1
+                    self.__shutdown(client_socket)
+                elif silence >= self.__heartbeat:
+                    queue.put(PING)
+            with self.__lock:
+                expired = [
+                    (s.name, self.__forget(s.socket, s.name))
+                    for s in list(self.__sessions.values())
+                    if s.detached is not None and now - s.detached > self.__resume_grace
+                ]
+            for name, recipients in expired:
+                self.__leave(name, recipients)
+            for offer in self.__spool.expire():
+                self._log.info(f"{offer.name} offered by {offer.sender} expired")
+            counters = self.counters()
+            if counters != logged:
+                self._log.info(
+                    "Connections: "
+                    + ", ".join(f"{k}={v}" for k, v in counters.items())
+                )
+                logged = counters
+
+    def __remove(
+        self: Server, socket: Socket, name: str, ended: bool = True
+    ) -> Optional[Set[Socket]]:
+        # returns the members of the rooms the client was in, None if there
+        # is nobody to tell: the session may resume or already has
+        recipients, detached = None, False
+        with self.__lock:
+            queue = self.__queues.pop(socket, None)
+            self.__seen.pop(socket, None)
+            traffic = self.__traffic.pop(socket, None)
+            if traffic is not None:
+                self.__retired.add(traffic)
+            session = self.__session_of.get(socket)
+            if socket not in self.__names:
+                # taken over by the connection that resumed the session
+                pass
+            elif session is not None and not ended:
+                session.detached = time.monotonic()
+                self.__counters["closed"] += 1
+                detached = True
+            else:
+                recipients = self.__forget(socket, name)
+                self.__counters["closed"] += 1
+        if queue is not None:
+            queue.close()
+        socket.close()
+        if detached:
+            self._log.info(
+                f"{name} disconnected, session kept for {self.__resume_grace:.0f}s"
+            )
+        return recipients
+
+    def __forget(self: Server, socket: Socket, name: str) -> Set[Socket]:
+        # called with the lock held
+        self.__names.pop(socket, None)
+        self.__current.pop(socket, None)
+        session = self.__session_of.pop(socket, None)
+        if session is not None:
+            self.__sessions.pop(session.token, None)
+        rooms = self.__rooms.remove(socket, name)
+        return set().union(*(self.__rooms.members(r) for r in rooms))
+
+    def __shutdown(self: Server, socket: Socket) -> None:
+        # wakes up the __process thread blocked in recv, which then removes the client
+        try:
+            socket.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
+
+    def __reply(self: Server, socket: Socket, message: str) -> None:
+        self.__dispatch_to(message, [socket])
+
+    def __replay(self: Server, socket: Socket, room: str, since: int = 0) -> None:
+        with self.__lock:
+            history = self.__history.get(room)
+            frames = history.since(since) if history is not None else []
+            queue = self.__queues.get(socket)
+            session = self.__session_of.get(socket)
+        if queue is None:
+            return
+        if session is None:
+            for frame in frames:
+                queue.put(frame)
+            return
+        # numbered like the live messages, so that a resume replays them too
+        with session.lock:
+            for frame in frames:
+                session.queue.put(session.number(frame[HEADER.size :]))
+
+    def __publish(self: Server, message: str, room: str) -> None:
+        # numbers the message in the history of the room, then sends it
+        with self.__lock:
+            history = self.__history.get(room)
+            if history is None:
+                history = self.__history[room] = History(self.__history_size)
+            message = f"[{room}:{history.sequence + 1}] {message}"
+            frame = encode_frame(FrameType.MESSAGE, message.encode())
+            history.append(frame)
+            members = list(self.__rooms.members(room))
+        self.__dispatch_frame(frame, members)
+
+    def __dispatch_to_room(self: Server, message: str, room: str) -> None:
+        with self.__lock:
+            members = list(self.__rooms.members(room))
+        self.__dispatch_to(message, members)
+
+    def __dispatch_to(self: Server, message: str, sockets: Iterable[Socket]) -> None:
+        self.__dispatch_frame(
+            encode_frame(FrameType.MESSAGE, message.encode()), sockets
+        )
+
+    def __dispatch_frame(self: Server, frame: bytes, sockets: Iterable[Socket]) -> None:
+        # MESSAGE frames are numbered for each client with a session, which
+        # also keeps them until they are acked, even while detached
+        start = time.perf_counter_ns()
+        numbered = HEADER.unpack_from(frame)[1] == FrameType.MESSAGE
+        message = frame[HEADER.size :] if numbered else b""
+        if len(message) > MAX_PAYLOAD_SIZE - SEQUENCE.size:
+            # checked before queueing anything: no client gets half a broadcast
+            raise FrameError(f"Message of {len(message)} bytes cannot be numbered")
+        clients = []
+        with self.__lock:
+            for s in sockets:
+                session = self.__session_of.get(s) if numbered else None
+                queue = self.__queues.get(s)
+                if session is not None or queue is not None:
+                    clients.append((s, queue, session))
+        for client_socket, queue, session in clients:
+            if session is None:
+                dropped = queue.dropped
+                queued = queue.put(frame)
+            else:
+                # numbered and queued in one go: the client gets the numbers
+                # in order; a detached session keeps them for the resume
+                with session.lock:
+                    queue = session.queue
+                    dropped = queue.dropped
+                    queued = queue.put(session.number(message))
+            if not queued:
+                if queue.closed:
+                    continue
+                self._log.warning(
+                    f"{self.__names.get(client_socket)} disconnected: outbound queue full"
+                )
+                with self.__lock:
+                    self.__counters["slow"] += 1
+                self.__shutdown(client_socket)
+            elif queue.dropped == 1 and dropped == 0:
+                self._log.warning(
+                    f"{self.__names.get(client_socket)} is a slow consumer, "
+                    f"dropping messages ({self.__policy.value})"
+                )
+        if numbered and self.__fanout is not None:
+            self.__fanout.record(time.perf_counter_ns() - start)
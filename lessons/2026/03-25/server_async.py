@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+from asyncio import StreamReader, StreamWriter
+from datetime import datetime
+from typing import Coroutine, Dict, Optional, Tuple
+
+from logger import Log
+from outbound import (
+    DEFAULT_QUEUE_SIZE,
+    QUEUE_REPORT_INTERVAL,
+    OutboundQueue,
+    SlowConsumerPolicy,
+    laggards,
+)
+from socket_extended import (
+    DEFAULT_BACKLOG,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    HEADER,
+    MAX_PAYLOAD_SIZE,
+    FrameError,
+    FrameType,
+    encode_frame,
+    set_keepalive,
+)
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+async def read_frame(reader: StreamReader) -> Optional[Tuple[int, bytes]]:
+    try:
+        length, type = HEADER.unpack(await reader.readexactly(HEADER.size))
+        if length > MAX_PAYLOAD_SIZE:
+            raise FrameError(f"Payload of {length} bytes exceeds {MAX_PAYLOAD_SIZE}")
+        return type, await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def run(main: Coroutine) -> any:
+    if uvloop is not None:
+        return uvloop.run(main)
+    return asyncio.run(main)
+
+
+class AsyncPeer:
+    def __init__(self: AsyncPeer, name: str, outbound: OutboundQueue) -> None:
+        self.name: str = name
+        self.outbound: OutboundQueue = outbound
+        self.ready: asyncio.Event = asyncio.Event()
+
+
+class AsyncServer:
+    def __init__(
+        self: AsyncServer,
+        log: Log,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST,
+        backlog: int = DEFAULT_BACKLOG,
+    ) -> None:
+        self._log: Log = log
+        self.__queue_size: int = queue_size
+        self.__policy: SlowConsumerPolicy = SlowConsumerPolicy(policy)
+        self.__backlog: int = backlog
+        self.__peers: Dict[StreamWriter, AsyncPeer] = {}
+
+    def queue_depths(self: AsyncServer) -> Dict[str, int]:
+        return {p.name: p.outbound.depth for p in self.__peers.values()}
+
+    def start(
+        self: AsyncServer,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ) -> None:
+        run(self.serve(host=host, port=port))
+
+    async def serve(
+        self: AsyncServer,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ) -> None:
+        server = await asyncio.start_server(
+            self.__process,
+            host=host,
+            port=port,
+            reuse_address=True,
+            backlog=self.__backlog,
+        )
+        loop = "uvloop" if uvloop is not None else "asyncio"
+        self._log.info(f"Waiting for incoming connection at {host}:{port} ({loop})")
+        report = asyncio.create_task(self.__report())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            report.cancel()
+
+    async def __report(self: AsyncServer) -> None:
+        while True:
+            await asyncio.sleep(QUEUE_REPORT_INTERVAL)
+            if (report := laggards(self.queue_depths())) is not None:
+                self._log.warning(f"Outbound queue depths: {report}")
+
+    async def __process(
+        self: AsyncServer, reader: StreamReader, writer: StreamWriter
+    ) -> None:
+        set_keepalive(writer.get_extra_info("socket"))
+        try:
+            frame = await read_frame(reader)
+        except (FrameError, ConnectionError):
+            frame = None
+        if frame is None or frame[0] != FrameType.NAME:
+            writer.close()
+            return
+        name = frame[1].decode(errors="replace")
+        peer: AsyncPeer = AsyncPeer(
+            name, OutboundQueue(self.__queue_size, self.__policy)
+        )
+        self.__peers[writer] = peer
+        deliver = asyncio.create_task(self.__deliver(writer, peer))
+        d = datetime.now()
+        message = f"{name} ({d}) joined the chat"
+        self._log.success(message)
+        self.__dispatch_to_others(message)
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None or frame[0] == FrameType.END:
+                    break
+                if frame[0] != FrameType.MESSAGE:
+                    continue
+                msg = frame[1].decode(errors="replace")
+                d = datetime.now()
+                self._log.success(f'{name} sends the message "{msg}"')
+                self.__dispatch_to_others(f"{name} ({d})> {msg}")
+        except (FrameError, ConnectionError):
+            pass
+        finally:
+            self.__peers.pop(writer, None)
+            peer.outbound.close()
+            deliver.cancel()
+            writer.close()
+        self._log.warning(f"{name} leaves the chat")
+        d = datetime.now()
+        self.__dispatch_to_others(f"{name} ({d}) leaves the chat")
+
+    async def __deliver(self: AsyncServer, writer: StreamWriter, peer: AsyncPeer) -> None:
+        try:
+            while not peer.outbound.closed:
+                await peer.ready.wait()
+                peer.ready.clear()
+                # a batch at a time, so that a laggard's backlog waits in its
+                # bounded queue rather than in the unbounded transport buffer;
+                # write() and not writelines(), which does not pause the
+                # protocol on some Python 3.12 releases and so never drains
+                while frames := peer.outbound.pop_batch():
+                    writer.write(b"".join(frames))
+                    await writer.drain()
+        except ConnectionError:
+            writer.transport.abort()
+
+    def __dispatch_to_others(self: AsyncServer, message: str) -> None:
+        data = encode_frame(FrameType.MESSAGE, message.encode())
+        for writer, peer in list(self.__peers.items()):
+            dropped = peer.outbound.dropped
+            if not peer.outbound.put(data):
+                self._log.warning(f"{peer.name} disconnected: outbound queue full")
+                writer.transport.abort()
+                continue
+            peer.ready.set()
+            if peer.outbound.dropped == 1 and dropped == 0:
+                self._log.warning(
+                    f"{peer.name} is a slow consumer, "
+                    f"dropping messages ({self.__policy.value})"
+                )
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+from selectors import EVENT_READ, EVENT_WRITE, DefaultSelector
+from socket import SOCK_STREAM
+from socket import socket as Socket
+from ssl import SSLContext
+from typing import Dict
+
+from logger import Log
+from outbound import DEFAULT_QUEUE_SIZE, OutboundQueue, SlowConsumerPolicy
+from server_selector import AF_UNIX, SO_REUSEPORT, Peer, SelectorServer
+from socket_extended import (
+    DEFAULT_BACKLOG,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    FrameError,
+    encode_frame,
+)
+from tls import DEFAULT_HANDSHAKE_WORKERS
+
+
+class BusHub:
+    def __init__(
+        self: BusHub, log: Log, path: str, queue_size: int = DEFAULT_QUEUE_SIZE
+    ) -> None:
+        self._log: Log = log
+        self.__path: str = path
+        self.__queue_size: int = queue_size
+        self.__selector: DefaultSelector = DefaultSelector()
+        self.__workers: Dict[Socket, Peer] = {}
+        if os.path.exists(path):
+            os.unlink(path)
+        self.__socket: Socket = Socket(family=AF_UNIX, type=SOCK_STREAM)
+        self.__socket.bind(path)
+        self.__socket.listen()
+        self.__socket.setblocking(False)
+        self.__selector.register(self.__socket, EVENT_READ, data=None)
+
+    def serve(self: BusHub) -> None:
+        while True:
+            for key, mask in self.__selector.select():
+                if key.data is None:
+                    self.__accept()
+                    continue
+                worker: Peer = key.data
+                if mask & EVENT_READ:
+                    self.__relay(worker)
+                if mask & EVENT_WRITE and worker.socket in self.__workers:
+                    self.__flush(worker)
+
+    def close(self: BusHub) -> None:
+        self.__socket.close()
+        if os.path.exists(self.__path):
+            os.unlink(self.__path)
+
+    def __accept(self: BusHub) -> None:
+        try:
+            worker_socket, _ = self.__socket.accept()
+        except BlockingIOError:
+            return
+        worker_socket.setblocking(False)
+        worker: Peer = Peer(worker_socket, OutboundQueue(self.__queue_size))
+        self.__workers[worker_socket] = worker
+        self.__selector.register(worker_socket, EVENT_READ, data=worker)
+        self._log.info(f"Worker {len(self.__workers)} joined the cluster bus")
+
+    def __relay(self: BusHub, worker: Peer) -> None:
+        try:
+            if worker.frames.recv_into(worker.socket) == 0:
+                self.__drop(worker)
+                return
+            while (frame := worker.frames.next_frame()) is not None:
+                data = encode_frame(*frame)
+                for other in self.__workers.values():
+                    if other is worker:
+                        continue
+                    idle = other.idle
+                    other.outbound.put(data)
+                    if idle:
+                        self.__selector.modify(
+                            other.socket, EVENT_READ | EVENT_WRITE, data=other
+                        )
+        except BlockingIOError:
+            return
+        except (FrameError, OSError):
+            self.__drop(worker)
+
+    def __flush(self: BusHub, worker: Peer) -> None:
+        try:
+            if worker.flush():
+                self.__selector.modify(worker.socket, EVENT_READ, data=worker)
+        except OSError:
+            self.__drop(worker)
+
+    def __drop(self: BusHub, worker: Peer) -> None:
+        if self.__workers.pop(worker.socket, None) is None:
+            return
+        self.__selector.unregister(worker.socket)
+        worker.outbound.close()
+        worker.socket.close()
+        self._log.warning("A worker left the cluster bus")
+
+
+class ClusterServer:
+    def __init__(
+        self: ClusterServer,
+        log: Log,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST,
+        workers: int = os.cpu_count(),
+        backlog: int = DEFAULT_BACKLOG,
+        tls: SSLContext = None,
+        handshake_workers: int = DEFAULT_HANDSHAKE_WORKERS,
+    ) -> None:
+        self._log: Log = log
+        self.__queue_size: int = queue_size
+        self.__policy: SlowConsumerPolicy = SlowConsumerPolicy(policy)
+        self.__workers: int = workers
+        self.__backlog: int = backlog
+        self.__tls: SSLContext = tls
+        self.__handshake_workers: int = handshake_workers
+
+    def start(
+        self: ClusterServer,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ) -> None:
+        if SO_REUSEPORT is None or AF_UNIX is None:
+            self._log.exception("The cluster mode needs SO_REUSEPORT and AF_UNIX")
+        path = os.path.join(tempfile.gettempdir(), f"yacr-bus-{os.getpid()}.sock")
+        hub: BusHub = BusHub(self._log, path, self.__queue_size)
+        # fork: the workers inherit the logger and the configuration as they are
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=self.__work, args=(i, host, port, path), daemon=True)
+            for i in range(self.__workers)
+        ]
+        for p in processes:
+            p.start()
+        self._log.info(
+            f"Started {self.__workers} workers sharing {host}:{port} (SO_REUSEPORT)"
+        )
+        # turn SIGTERM into SystemExit so the workers and the bus are cleaned up
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            hub.serve()
+        finally:
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            for p in processes:
+                p.terminate()
+                p.join()
+            hub.close()
+
+    def __work(self: ClusterServer, i: int, host: str, port: int, bus: str) -> None:
+        self._log.split(f"worker{i}")
+        server: SelectorServer = SelectorServer(
+            log=self._log,
+            queue_size=self.__queue_size,
+            policy=self.__policy,
+            bus=bus,
+            backlog=self.__backlog,
+            tls=self.__tls,
+            handshake_workers=self.__handshake_workers,
+        )
+        server.start(host=host, port=port, reuse_port=True)
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from selectors import EVENT_READ, EVENT_WRITE, DefaultSelector, SelectorKey
+from socket import SO_REUSEADDR, SOCK_STREAM, SOL_SOCKET
+from socket import socket as Socket
+from ssl import SSLContext, SSLWantReadError, SSLWantWriteError
+from typing import Dict, List
+
+from logger import Log
+from outbound import (
+    DEFAULT_QUEUE_SIZE,
+    QUEUE_REPORT_INTERVAL,
+    OutboundQueue,
+    SlowConsumerPolicy,
+    laggards,
+)
+from socket_extended import (
+    DEFAULT_BACKLOG,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    FrameBuffer,
+    FrameError,
+    FrameType,
+    SocketExtended,
+    encode_frame,
+    pending,
+    send_frames,
+    set_keepalive,
+)
+from tls import DEFAULT_HANDSHAKE_WORKERS, HandshakePool
+
+try:
+    from socket import AF_UNIX, SO_REUSEPORT
+except ImportError:
+    # not available on Windows, the cluster mode needs them
+    AF_UNIX = SO_REUSEPORT = None
+
+
+class Peer:
+    def __init__(self: Peer, socket: Socket, outbound: OutboundQueue) -> None:
+        self.socket: Socket = socket
+        self.name: str = None
+        self.frames: FrameBuffer = FrameBuffer()
+        self.outbound: OutboundQueue = outbound
+        self.pending: List[memoryview] = []
+        # TLS: a write waiting for the socket to be readable, or the reverse
+        self.want_read: bool = False
+        self.want_write: bool = False
+
+    @property
+    def idle(self: Peer) -> bool:
+        return not self.pending and self.outbound.depth == 0
+
+    def flush(self: Peer) -> bool:
+        # True once the queue is empty, False if the socket would block
+        while True:
+            if not self.pending:
+                self.pending = self.outbound.pop_batch()
+                if not self.pending:
+                    return True
+            try:
+                self.pending = send_frames(self.socket, self.pending)
+            except (BlockingIOError, SSLWantWriteError):
+                return False
+            if self.pending:
+                return False
+
+
+class SelectorServer(SocketExtended):
+    def __init__(
+        self: SelectorServer,
+        log: Log,
+        path: str = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST,
+        bus: str = None,
+        backlog: int = DEFAULT_BACKLOG,
+        tls: SSLContext = None,
+        handshake_workers: int = DEFAULT_HANDSHAKE_WORKERS,
+    ) -> None:
+        super().__init__(log, path=path)
+        self.__queue_size: int = queue_size
+        self.__policy: SlowConsumerPolicy = SlowConsumerPolicy(policy)
+        self.__backlog: int = backlog
+        self.__tls: SSLContext = tls
+        self.__handshake_workers: int = handshake_workers
+        self.__handshakes: HandshakePool = None
+        self.__selector: DefaultSelector = DefaultSelector()
+        self.__peers: Dict[Socket, Peer] = {}
+        # Unix socket of the cluster bus that relays broadcasts between workers
+        self.__bus_path: str = bus
+        self.__bus: Peer = None
+
+    def queue_depths(self: SelectorServer) -> Dict[str, int]:
+        return {
+            p.name: p.outbound.depth
+            for p in self.__peers.values()
+            if p.name is not None
+        }
+
+    def start(
+        self: SelectorServer,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        reuse_port: bool = False,
+    ) -> None:
+        self._socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        if reuse_port:
+            self._socket.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+        self._bind(host, port)
+        self._socket.listen(self.__backlog)
+        self._socket.setblocking(False)
+        self.__selector.register(self._socket, EVENT_READ, data=None)
+        if self.__bus_path is not None:
+            self.__connect_bus()
+        if self.__tls is not None:
+            self.__handshakes = HandshakePool(self.__tls, self.__handshake_workers)
+            self.__selector.register(self.__handshakes, EVENT_READ, data=None)
+        secure = " over TLS" if self.__tls is not None else ""
+        self._log.info(
+            f"Waiting for incoming connection at {self._where(host, port)} "
+            f"(selector{secure})"
+        )
+        report = time.monotonic() + QUEUE_REPORT_INTERVAL
+        while True:
+            for key, mask in self.__selector.select(timeout=QUEUE_REPORT_INTERVAL):
+                if key.fileobj is self._socket:
+                    self.__accept()
+                elif key.fileobj is self.__handshakes:
+                    self.__secured()
+                else:
+                    self.__service(key, mask)
+            # checked on the loop thread, the only one that touches the peers
+            if time.monotonic() >= report:
+                report = time.monotonic() + QUEUE_REPORT_INTERVAL
+                self.__report()
+
+    def __report(self: SelectorServer) -> None:
+        if (report := laggards(self.queue_depths())) is not None:
+            self._log.warning(f"Outbound queue depths: {report}")
+
+    def __connect_bus(self: SelectorServer) -> None:
+        bus = Socket(family=AF_UNIX, type=SOCK_STREAM)
+        try:
+            bus.connect(self.__bus_path)
+        except OSError as os_err:
+            self._log.exception(
+                f"Cluster bus not reachable at {self.__bus_path}", error=os_err
+            )
+        bus.setblocking(False)
+        self.__bus = Peer(bus, OutboundQueue(self.__queue_size))
+        self.__bus.name = "bus"
+        self.__selector.register(bus, EVENT_READ, data=self.__bus)
+
+    def __accept(self: SelectorServer) -> None:
+        try:
+            client_socket, _ = self._socket.accept()
+        except BlockingIOError:
+            return
+        set_keepalive(client_socket)
+        if self.__handshakes is not None:
+            self.__handshakes.submit(client_socket)
+            return
+        client_socket.setblocking(False)
+        self.__register(client_socket)
+
+    def __secured(self: SelectorServer) -> None:
+        for client_socket, error in self.__handshakes.completed():
+            if error is not None:
+                self._log.warning(f"TLS handshake failed: {error}")
+                continue
+            self.__register(client_socket)
+
+    def __register(self: SelectorServer, client_socket: Socket) -> None:
+        peer: Peer = Peer(
+            client_socket, OutboundQueue(self.__queue_size, self.__policy)
+        )
+        self.__peers[client_socket] = peer
+        self.__selector.register(client_socket, EVENT_READ, data=peer)
+        # a TLS client may have sent its NAME with the end of the handshake
+        if pending(client_socket):
+            self.__read(peer)
+
+    def __service(self: SelectorServer, key: SelectorKey, mask: int) -> None:
+        peer: Peer = key.data
+        if mask & EVENT_READ:
+            self.__read(peer)
+            if peer.want_read and self.__alive(peer):
+                # readable again: the blocked write can be retried
+                peer.want_read = False
+                self.__selector.modify(peer.socket, EVENT_READ | EVENT_WRITE, data=peer)
+        if mask & EVENT_WRITE and self.__alive(peer):
+            if peer.want_write:
+                peer.want_write = False
+                self.__read(peer)
+            if self.__alive(peer):
+                self.__flush(peer)
+
+    def __alive(self: SelectorServer, peer: Peer) -> bool:
+        return peer is self.__bus or peer.socket in self.__peers
+
+    def __read(self: SelectorServer, peer: Peer) -> None:
+        try:
+            while True:
+                if peer.frames.recv_into(peer.socket) == 0:
+                    self.__drop(peer)
+                    return
+                while (frame := peer.frames.next_frame()) is not None:
+                    if peer is self.__bus:
+                        # broadcast of another worker: deliver, never republish
+                        self.__fan_out(encode_frame(*frame))
+                        continue
+                    self.__handle(peer, *frame)
+                    if not self.__alive(peer):
+                        return
+                # TLS records decrypted but not read yet do not wake up select
+                if not pending(peer.socket):
+                    return
+        except (BlockingIOError, SSLWantReadError):
+            return
+        except SSLWantWriteError:
+            # the TLS layer must write before it can read (e.g. a key update)
+            peer.want_write = True
+            self.__selector.modify(peer.socket, EVENT_READ | EVENT_WRITE, data=peer)
+        except (FrameError, OSError):
+            self.__drop(peer)
+
+    def __handle(self: SelectorServer, peer: Peer, type: int, payload: bytes) -> None:
+        d = datetime.now()
+        if peer.name is None:
+            if type != FrameType.NAME:
+                self.__drop(peer)
+                return
+            peer.name = payload.decode(errors="replace")
+            message = f"{peer.name} ({d}) joined the chat"
+            self._log.success(message)
+            self.__dispatch_to_others(message)
+        elif type == FrameType.END:
+            self.__drop(peer)
+        elif type == FrameType.MESSAGE:
+            msg = payload.decode(errors="replace")
+            self._log.success(f'{peer.name} sends the message "{msg}"')
+            self.__dispatch_to_others(f"{peer.name} ({d})> {msg}")
+
+    def __flush(self: SelectorServer, peer: Peer) -> None:
+        try:
+            if peer.flush():
+                self.__selector.modify(peer.socket, EVENT_READ, data=peer)
+        except SSLWantReadError:
+            # the TLS layer must read before it can write: stop polling for
+            # EVENT_WRITE until the socket is readable
+            peer.want_read = True
+            self.__selector.modify(peer.socket, EVENT_READ, data=peer)
+        except OSError:
+            self.__drop(peer)
+
+    def __drop(self: SelectorServer, peer: Peer) -> None:
+        if peer is self.__bus:
+            self.__selector.unregister(peer.socket)
+            peer.socket.close()
+            self.__bus = None
+            self._log.warning("Cluster bus lost, broadcasts stay local to this worker")
+            return
+        if self.__peers.pop(peer.socket, None) is None:
+            return
+        self.__selector.unregister(peer.socket)
+        peer.outbound.close()
+        peer.socket.close()
+        if peer.name is not None:
+            self._log.warning(f"{peer.name} leaves the chat")
+            d = datetime.now()
+            self.__dispatch_to_others(f"{peer.name} ({d}) leaves the chat")
+
+    def __dispatch_to_others(self: SelectorServer, message: str) -> None:
+        data = encode_frame(FrameType.MESSAGE, message.encode())
+        self.__fan_out(data)
+        if self.__bus is not None:
+            self.__enqueue(self.__bus, data)
+
+    def __enqueue(self: SelectorServer, peer: Peer, data: bytes) -> bool:
+        idle = peer.idle
+        if not peer.outbound.put(data):
+            return False
+        if idle and not peer.want_read:
+            self.__selector.modify(peer.socket, EVENT_READ | EVENT_WRITE, data=peer)
+        return True
+
+    def __fan_out(self: SelectorServer, data: bytes) -> None:
+        slow: List[Peer] = []
+        for peer in self.__peers.values():
+            if peer.name is None:
+                continue
+            dropped = peer.outbound.dropped
+            if not self.__enqueue(peer, data):
+                slow.append(peer)
+            elif peer.outbound.dropped == 1 and dropped == 0:
+                self._log.warning(
+                    f"{peer.name} is a slow consumer, "
+                    f"dropping messages ({self.__policy.value})"
+                )
+        for peer in slow:
+            self._log.warning(f"{peer.name} disconnected: outbound queue full")
+            self.__drop(peer)
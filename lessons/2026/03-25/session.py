@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import secrets
+from collections import deque
+from socket import socket as Socket
+from threading import Lock
+from typing import Deque, List, Optional, Tuple
+
+from outbound import OutboundQueue
+from socket_extended import HEADER, SEQUENCE, FrameType
+
+# seconds a disconnected session waits for its client to come back
+DEFAULT_RESUME_GRACE: float = 30
+# unacked messages kept for each session, the oldest are lost beyond it
+DEFAULT_RESUME_BUFFER: int = 1024
+# the client acks after this many messages, and on every PING
+ACK_EVERY: int = 32
+
+
+# a SEQUENCED frame: its own header and sequence, and the message shared by all
+# the recipients of a broadcast, queued as they are and sent with one sendmsg
+Numbered = Tuple[bytes, bytes]
+
+
+class Session:
+    def __init__(
+        self: Session,
+        socket: Socket,
+        name: str,
+        queue: OutboundQueue,
+        size: int = DEFAULT_RESUME_BUFFER,
+    ) -> None:
+        self.token: str = secrets.token_urlsafe(16)
+        # connection of the session, the closed one while detached
+        self.socket: Socket = socket
+        self.name: str = name
+        # outbound queue of the connection: numbers are given and the frames
+        # queued under the lock, so the client gets them in order
+        self.queue: OutboundQueue = queue
+        self.lock: Lock = Lock()
+        # monotonic time of the disconnection, None while connected
+        self.detached: Optional[float] = None
+        self.__sequence: int = 0
+        self.__frames: Deque[Tuple[int, Numbered]] = deque(maxlen=size)
+
+    def number(self: Session, message: bytes) -> Numbered:
+        # the SEQUENCED frame of a message, kept until the client acks it
+        self.__sequence += 1
+        header = HEADER.pack(SEQUENCE.size + len(message), FrameType.SEQUENCED)
+        frame = (header + SEQUENCE.pack(self.__sequence), message)
+        self.__frames.append((self.__sequence, frame))
+        return frame
+
+    def ack(self: Session, sequence: int) -> None:
+        while self.__frames and self.__frames[0][0] <= sequence:
+            self.__frames.popleft()
+
+    def since(self: Session, sequence: int) -> Tuple[List[Numbered], int]:
+        # the frames after sequence still buffered, and how many were lost
+        frames = [f for n, f in self.__frames if n > sequence]
+        first = self.__frames[0][0] if self.__frames else self.__sequence + 1
+        return frames, max(0, first - sequence - 1)
@@ -1,24 +1,283 @@
 from __future__ import annotations
 
-from socket import AF_INET, SOCK_STREAM
+import os
+import socket as socket_module
+import stat
+from enum import IntEnum
+from select import select
+from socket import (
+    AF_INET,
+    IPPROTO_TCP,
+    SHUT_RDWR,
+    SO_KEEPALIVE,
+    SOCK_STREAM,
+    SOL_SOCKET,
+    SOMAXCONN,
+)
 from socket import error as SocketError
 from socket import socket as Socket
+from ssl import SSLContext, SSLSocket, SSLWantReadError, SSLWantWriteError
+from struct import Struct
+from threading import Lock
+from typing import Callable, List, Optional, Sequence, Tuple
 
 from logger import Log
 
+try:
+    from socket import AF_UNIX
+except ImportError:
+    # not available on Windows, the Unix socket transport needs it
+    AF_UNIX = None
+
 DEFAULT_HOST: str = "localhost"
 DEFAULT_PORT: int = 32000
 
+# frame header: payload length (uint32, network order) + frame type (uint8)
+HEADER: Struct = Struct("!IB")
+# SEQUENCED payload: session sequence number (uint64) + message
+SEQUENCE: Struct = Struct("!Q")
+MAX_PAYLOAD_SIZE: int = 1 << 20
+# what a client may send, leaving room for what the server adds to it (room,
+# sequence, name and time, the session sequence number)
+MAX_NAME_SIZE: int = 256
+MAX_MESSAGE_SIZE: int = MAX_PAYLOAD_SIZE - (1 << 12)
+DEFAULT_BUFFER_SIZE: int = 1 << 16
+DEFAULT_BACKLOG: int = SOMAXCONN
+# no sendmsg over TLS: frames are joined and encrypted up to this many bytes
+TLS_BATCH_SIZE: int = 1 << 16
+
+# TCP keepalive: first probe after KEEPALIVE_IDLE seconds of silence, then
+# KEEPALIVE_COUNT probes KEEPALIVE_INTERVAL seconds apart before the reset
+KEEPALIVE_IDLE: int = 60
+KEEPALIVE_INTERVAL: int = 10
+KEEPALIVE_COUNT: int = 5
+
+# application heartbeat: PING a client silent for DEFAULT_HEARTBEAT seconds,
+# close it after DEFAULT_IDLE_TIMEOUT seconds without any frame
+DEFAULT_HEARTBEAT: float = 15
+DEFAULT_IDLE_TIMEOUT: float = 45
+
+
+class FrameType(IntEnum):
+    NAME = 1
+    MESSAGE = 2
+    END = 3
+    PING = 4
+    PONG = 5
+    # file transfers: OFFER on the chat connection, UPLOAD and DOWNLOAD open
+    # a data connection of their own
+    OFFER = 6
+    UPLOAD = 7
+    DOWNLOAD = 8
+    # resumable sessions: SESSION after NAME asks for a token, as the first
+    # frame it resumes a session; the client ACKs the SEQUENCED messages
+    SESSION = 9
+    ACK = 10
+    SEQUENCED = 11
+
+
+class FrameError(Exception):
+    pass
+
+
+def encode_frame(type: FrameType, payload: bytes = b"") -> bytes:
+    if len(payload) > MAX_PAYLOAD_SIZE:
+        raise FrameError(f"Payload of {len(payload)} bytes exceeds {MAX_PAYLOAD_SIZE}")
+    return HEADER.pack(len(payload), type) + payload
+
+
+def set_keepalive(
+    socket: Socket,
+    idle: int = KEEPALIVE_IDLE,
+    interval: int = KEEPALIVE_INTERVAL,
+    count: int = KEEPALIVE_COUNT,
+) -> None:
+    if socket.family == AF_UNIX:
+        # no peer on another host that could vanish: nothing to probe
+        return
+    socket.setsockopt(SOL_SOCKET, SO_KEEPALIVE, 1)
+    # TCP_KEEPIDLE is TCP_KEEPALIVE on macOS, the others may be missing
+    for option, value in (
+        ("TCP_KEEPIDLE", idle),
+        ("TCP_KEEPALIVE", idle),
+        ("TCP_KEEPINTVL", interval),
+        ("TCP_KEEPCNT", count),
+    ):
+        if hasattr(socket_module, option):
+            socket.setsockopt(IPPROTO_TCP, getattr(socket_module, option), value)
+
+
+def send_frames(socket: Socket, frames: Sequence[bytes]) -> List[memoryview]:
+    # scatter-gather: one sendmsg for the whole batch, returns what was not sent
+    if isinstance(socket, SSLSocket):
+        size = 0
+        for i, frame in enumerate(frames):
+            size += len(frame)
+            if size >= TLS_BATCH_SIZE:
+                break
+        sent = socket.send(b"".join(frames[: i + 1]))
+    elif hasattr(socket, "sendmsg"):
+        sent = socket.sendmsg(frames)
+    else:
+        sent = socket.send(b"".join(frames))
+    for i, frame in enumerate(frames):
+        if sent < len(frame):
+            return [memoryview(frame)[sent:], *frames[i + 1 :]]
+        sent -= len(frame)
+    return []
+
+
+def pending(socket: Socket) -> int:
+    # bytes already decrypted by TLS: select does not see them
+    return socket.pending() if isinstance(socket, SSLSocket) else 0
+
+
+def sendall_frames(socket: Socket, frames: Sequence[bytes]) -> None:
+    while frames:
+        frames = send_frames(socket, frames)
+
+
+class FrameBuffer:
+    def __init__(self: FrameBuffer, size: int = DEFAULT_BUFFER_SIZE) -> None:
+        self.__buffer: bytearray = bytearray(size)
+        self.__view: memoryview = memoryview(self.__buffer)
+        self.__start: int = 0
+        self.__end: int = 0
+
+    def recv_into(self: FrameBuffer, socket: Socket) -> int:
+        if self.__end == len(self.__buffer):
+            self.__compact()
+        n = socket.recv_into(self.__view[self.__end :])
+        self.__end += n
+        return n
+
+    def next_frame(self: FrameBuffer) -> Optional[Tuple[int, bytes]]:
+        available = self.__end - self.__start
+        if available < HEADER.size:
+            return None
+        length, type = HEADER.unpack_from(self.__buffer, self.__start)
+        if length > MAX_PAYLOAD_SIZE:
+            raise FrameError(f"Payload of {length} bytes exceeds {MAX_PAYLOAD_SIZE}")
+        if available < HEADER.size + length:
+            return None
+        begin = self.__start + HEADER.size
+        payload = bytes(self.__view[begin : begin + length])
+        self.__start = begin + length
+        if self.__start == self.__end:
+            self.__start = self.__end = 0
+        return type, payload
+
+    def read(self: FrameBuffer, socket: Socket) -> Optional[Tuple[int, bytes]]:
+        frame = self.next_frame()
+        while frame is None:
+            if self.recv_into(socket) == 0:
+                return None
+            frame = self.next_frame()
+        return frame
+
+    def __compact(self: FrameBuffer) -> None:
+        pending = self.__end - self.__start
+        if self.__start > 0:
+            self.__buffer[:pending] = self.__buffer[self.__start : self.__end]
+            self.__start, self.__end = 0, pending
+        needed = HEADER.size
+        if pending >= HEADER.size:
+            needed += HEADER.unpack_from(self.__buffer, 0)[0]
+        if needed > len(self.__buffer):
+            # a single frame larger than the buffer: grow it to fit
+            self.__view.release()
+            self.__buffer.extend(bytes(needed - len(self.__buffer)))
+            self.__view = memoryview(self.__buffer)
+
 
 class SocketExtended:
-    def __init__(self: SocketExtended, log: Log) -> None:
+    def __init__(self: SocketExtended, log: Log, path: str = None) -> None:
         self._log: Log = log
+        # Unix socket path, used instead of host and port when set
+        self._path: str = path
+        self.__frames: FrameBuffer = FrameBuffer()
+        # set once the connection is secured with TLS
+        self.__tls: Lock = None
+        if path is not None and AF_UNIX is None:
+            self._log.exception("Unix sockets are not available on this platform")
+        family = AF_INET if path is None else AF_UNIX
         try:
-            # create a TCP socket (SOCK_STREAM)
-            self._socket: Socket = Socket(family=AF_INET, type=SOCK_STREAM, proto=0)
+            # create a TCP (AF_INET) or Unix (AF_UNIX) stream socket
+            self._socket: Socket = Socket(family=family, type=SOCK_STREAM, proto=0)
             self._log.success("Socket created")
             self.send = self._socket.send
             self.recv = self._socket.recv
             self.close = self._socket.close
         except SocketError as socket_err:
             self._log.exception("Error during creation of the socket", error=socket_err)
+
+    def send_frame(self: SocketExtended, type: FrameType, payload: bytes = b"") -> None:
+        if self.__tls is None:
+            self._socket.sendall(encode_frame(type, payload))
+            return
+        data = memoryview(encode_frame(type, payload))
+        while data:
+            data = data[self.__tls_call(self._socket.send, data) :]
+
+    def recv_frame(self: SocketExtended) -> Optional[Tuple[int, bytes]]:
+        if self.__tls is None:
+            return self.__frames.read(self._socket)
+        while (frame := self.__frames.next_frame()) is None:
+            if self.__tls_call(self.__frames.recv_into, self._socket) == 0:
+                return None
+        return frame
+
+    def _renew(self: SocketExtended) -> None:
+        # a new socket and frame buffer to connect again; shutdown wakes up
+        # a thread blocked reading the old socket
+        family = self._socket.family
+        try:
+            self._socket.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+        self._socket = Socket(family=family, type=SOCK_STREAM, proto=0)
+        self.__frames = FrameBuffer()
+        self.__tls = None
+        self.send = self._socket.send
+        self.recv = self._socket.recv
+        self.close = self._socket.close
+
+    def _address(self: SocketExtended, host: str, port: int) -> any:
+        return (host, port) if self._path is None else self._path
+
+    def _where(self: SocketExtended, host: str, port: int) -> str:
+        return f"{host}:{port}" if self._path is None else self._path
+
+    def _bind(self: SocketExtended, host: str, port: int) -> None:
+        try:
+            # a socket file left behind by a previous run makes bind fail
+            if self._path is not None and stat.S_ISSOCK(os.stat(self._path).st_mode):
+                os.unlink(self._path)
+        except FileNotFoundError:
+            pass
+        self._socket.bind(self._address(host, port))
+
+    def _secure(self: SocketExtended, context: SSLContext, hostname: str) -> None:
+        # TLS handshake on the connected socket, then nonblocking (see __tls_call)
+        self._socket = context.wrap_socket(self._socket, server_hostname=hostname)
+        self._socket.setblocking(False)
+        self.send = self._socket.send
+        self.recv = self._socket.recv
+        self.close = self._socket.close
+        self.__tls = Lock()
+
+    def __tls_call(self: SocketExtended, call: Callable, *args: any) -> int:
+        # a TLS connection must not read and write from two threads at the
+        # same time: the socket is nonblocking, every call holds the lock and
+        # the wait for the socket happens outside of it
+        while True:
+            with self.__tls:
+                try:
+                    return call(*args)
+                except SSLWantReadError:
+                    wait = ([self._socket], [])
+                except SSLWantWriteError:
+                    wait = ([], [self._socket])
+            # the timeout covers a record read by the other thread meanwhile
+            select(*wait, [], 1)
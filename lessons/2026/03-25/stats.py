@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from threading import Lock, Thread, current_thread, local
+from typing import Deque, Dict, List, Tuple
+
+DEFAULT_ADMIN_HOST: str = "127.0.0.1"
+# windows of the messages per second, in seconds
+RATE_WINDOWS: Tuple[int, ...] = (1, 10, 60)
+# buckets of the latency histogram: < 1us, < 2us, < 4us, ... < 2^23us (~8s)
+LATENCY_BUCKETS: int = 24
+
+
+class Traffic:
+    # counters of one connection: the reader thread writes the *_in ones and
+    # the writer thread the *_out ones, so they need no lock
+    def __init__(self: Traffic) -> None:
+        self.frames_in: int = 0
+        self.bytes_in: int = 0
+        self.messages_in: int = 0
+        self.frames_out: int = 0
+        self.bytes_out: int = 0
+
+    def as_dict(self: Traffic) -> Dict[str, int]:
+        return {
+            "frames_in": self.frames_in,
+            "bytes_in": self.bytes_in,
+            "messages_in": self.messages_in,
+            "frames_out": self.frames_out,
+            "bytes_out": self.bytes_out,
+        }
+
+    def add(self: Traffic, other: Traffic) -> None:
+        self.frames_in += other.frames_in
+        self.bytes_in += other.bytes_in
+        self.messages_in += other.messages_in
+        self.frames_out += other.frames_out
+        self.bytes_out += other.bytes_out
+
+
+class Histogram:
+    # each thread records into buckets of its own; a snapshot sums them, and
+    # the buckets of the threads that ended are folded into the retired ones
+    # whenever a new thread shows up, so the list follows the live threads
+    def __init__(self: Histogram, buckets: int = LATENCY_BUCKETS) -> None:
+        self.__size: int = buckets
+        self.__local: local = local()
+        self.__threads: List[Tuple[Thread, List[int]]] = []
+        self.__retired: List[int] = [0] * buckets
+        self.__lock: Lock = Lock()
+
+    def record(self: Histogram, ns: int) -> None:
+        buckets = getattr(self.__local, "buckets", None)
+        if buckets is None:
+            buckets = self.__local.buckets = [0] * self.__size
+            with self.__lock:
+                self.__prune()
+                self.__threads.append((current_thread(), buckets))
+        buckets[min(self.__size - 1, (ns // 1000).bit_length())] += 1
+
+    def snapshot(self: Histogram) -> Dict[str, int]:
+        with self.__lock:
+            alive = self.__prune()
+            total = list(self.__retired)
+        for _, buckets in alive:
+            for i, n in enumerate(buckets):
+                total[i] += n
+        return {f"<{1 << i}us": n for i, n in enumerate(total) if n > 0}
+
+    def __prune(self: Histogram) -> List[Tuple[Thread, List[int]]]:
+        # called with the lock held
+        alive = []
+        for thread, buckets in self.__threads:
+            if thread.is_alive():
+                alive.append((thread, buckets))
+            else:
+                for i, n in enumerate(buckets):
+                    self.__retired[i] += n
+        self.__threads = alive
+        return alive
+
+
+class Rates:
+    # events per second over sliding windows, from a total sampled every second
+    def __init__(self: Rates, windows: Tuple[int, ...] = RATE_WINDOWS) -> None:
+        self.__windows: Tuple[int, ...] = windows
+        self.__samples: Deque[Tuple[float, int]] = deque(maxlen=max(windows) + 1)
+
+    def sample(self: Rates, total: int) -> None:
+        self.__samples.append((time.monotonic(), total))
+
+    def rates(self: Rates) -> Dict[str, float]:
+        samples = list(self.__samples)
+        rates = {}
+        for w in self.__windows:
+            if len(samples) < 2:
+                rates[f"{w}s"] = 0.0
+                continue
+            now, last = samples[-1]
+            then, first = samples[max(0, len(samples) - 1 - w)]
+            rates[f"{w}s"] = round((last - first) / (now - then), 1)
+        return rates
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import ssl
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+from socket import socket as Socket
+from socket import socketpair
+from ssl import SSLContext, SSLSocket
+from typing import List, Optional, Tuple
+
+DEFAULT_HANDSHAKE_WORKERS: int = 4
+DEFAULT_HANDSHAKE_TIMEOUT: float = 10
+
+
+def server_context(cert: str, key: str, ca: str = None) -> SSLContext:
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    if ca is not None:
+        # mutual TLS: only clients with a certificate signed by ca get in
+        context.load_verify_locations(ca)
+        context.verify_mode = ssl.CERT_REQUIRED
+    return context
+
+
+def client_context(ca: str = None, cert: str = None, key: str = None) -> SSLContext:
+    # ca None: the certificate of the server is checked with the system CAs
+    context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=ca)
+    if cert is not None:
+        context.load_cert_chain(cert, key)
+    return context
+
+
+class HandshakePool:
+    def __init__(
+        self: HandshakePool,
+        context: SSLContext,
+        workers: int = DEFAULT_HANDSHAKE_WORKERS,
+        timeout: float = DEFAULT_HANDSHAKE_TIMEOUT,
+    ) -> None:
+        # the handshake is the expensive part of a TLS connection: it runs in
+        # worker threads (OpenSSL releases the GIL) so a burst of new clients
+        # does not stall the selector loop serving the connected ones
+        self.__context: SSLContext = context
+        self.__timeout: float = timeout
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            workers, thread_name_prefix="tls-handshake"
+        )
+        self.__done: SimpleQueue = SimpleQueue()
+        # the selector loop watches the read end, a worker writes a byte
+        # to it for every handshake done
+        self.__wakeup, self.__notify = socketpair()
+        self.__wakeup.setblocking(False)
+        self.__notify.setblocking(False)
+
+    def fileno(self: HandshakePool) -> int:
+        return self.__wakeup.fileno()
+
+    def submit(self: HandshakePool, socket: Socket) -> None:
+        self.__executor.submit(self.__handshake, socket)
+
+    def completed(self: HandshakePool) -> List[Tuple[Optional[SSLSocket], OSError]]:
+        # nonblocking TLS sockets, or None and the error of a failed handshake
+        try:
+            while self.__wakeup.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        done = []
+        try:
+            while True:
+                done.append(self.__done.get_nowait())
+        except Empty:
+            return done
+
+    def __handshake(self: HandshakePool, socket: Socket) -> None:
+        # blocking with a timeout: a client that stalls the handshake only
+        # holds a worker for that long
+        try:
+            socket.settimeout(self.__timeout)
+            tls: SSLSocket = self.__context.wrap_socket(socket, server_side=True)
+            tls.setblocking(False)
+            self.__done.put((tls, None))
+        except OSError as os_err:
+            socket.close()
+            self.__done.put((None, os_err))
+        try:
+            self.__notify.send(b"\0")
+        except BlockingIOError:
+            # the loop has not drained the previous bytes yet, it will wake up
+            pass
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+import secrets
+import tempfile
+import time
+from socket import socket as Socket
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from socket_extended import HEADER, MAX_PAYLOAD_SIZE, FrameError
+
+DEFAULT_SPOOL: str = os.path.join(tempfile.gettempdir(), "yacr-spool")
+DEFAULT_DOWNLOADS: str = "downloads"
+# spooled files are removed after this many seconds
+DEFAULT_SPOOL_TTL: float = 3600
+MAX_FILE_SIZE: int = 1 << 30
+# bytes moved per call: a transfer stops at a chunk boundary at worst
+CHUNK_SIZE: int = 1 << 20
+# attempts of an upload or a download, each one resumes where the last stopped
+TRANSFER_ATTEMPTS: int = 3
+TRANSFER_TIMEOUT: float = 30
+
+
+def read_reply(socket: Socket) -> Optional[Tuple[int, bytes]]:
+    # exactly one frame: the file bytes that follow it must stay in the socket
+    header = recv_exactly(socket, HEADER.size)
+    if header is None:
+        return None
+    length, type = HEADER.unpack(header)
+    if length > MAX_PAYLOAD_SIZE:
+        raise FrameError(f"Payload of {length} bytes exceeds {MAX_PAYLOAD_SIZE}")
+    payload = recv_exactly(socket, length)
+    return None if payload is None else (type, payload)
+
+
+def recv_exactly(socket: Socket, n: int) -> Optional[bytes]:
+    data = bytearray()
+    while len(data) < n:
+        chunk = socket.recv(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def send_file(socket: Socket, path: str, offset: int, size: int) -> int:
+    # zero-copy: sendfile moves the bytes from the page cache to the socket
+    # without going through Python, returns the offset reached
+    with open(path, "rb") as file:
+        while offset < size:
+            sent = socket.sendfile(file, offset, min(CHUNK_SIZE, size - offset))
+            if sent == 0:
+                break
+            offset += sent
+    return offset
+
+
+def receive_file(socket: Socket, path: str, offset: int, size: int) -> int:
+    # appends the bytes after offset to path, returns the offset reached
+    buffer: memoryview = memoryview(bytearray(CHUNK_SIZE))
+    with open(path, "ab") as file:
+        while offset < size:
+            n = socket.recv_into(buffer[: min(CHUNK_SIZE, size - offset)])
+            if n == 0:
+                break
+            file.write(buffer[:n])
+            offset += n
+    return offset
+
+
+class Offer:
+    def __init__(
+        self: Offer, id: str, sender: str, target: str, name: str, size: int
+    ) -> None:
+        self.id: str = id
+        self.sender: str = sender
+        self.target: str = target
+        # base name only: the sender's directories stay private
+        self.name: str = os.path.basename(name)
+        self.size: int = size
+        self.created: float = time.monotonic()
+
+
+class Spool:
+    def __init__(
+        self: Spool, directory: str = DEFAULT_SPOOL, ttl: float = DEFAULT_SPOOL_TTL
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.__directory: str = directory
+        self.__ttl: float = ttl
+        self.__offers: Dict[str, Offer] = {}
+        self.__lock: Lock = Lock()
+
+    def offer(self: Spool, sender: str, target: str, name: str, size: int) -> Offer:
+        # the id is the capability to upload and download the file
+        offer = Offer(secrets.token_hex(8), sender, target, name, size)
+        with self.__lock:
+            self.__offers[offer.id] = offer
+        return offer
+
+    def get(self: Spool, id: str) -> Optional[Offer]:
+        with self.__lock:
+            return self.__offers.get(id)
+
+    def path(self: Spool, id: str) -> str:
+        return os.path.join(self.__directory, id)
+
+    def received(self: Spool, id: str) -> int:
+        # bytes already spooled, where an interrupted upload resumes
+        try:
+            return os.path.getsize(self.path(id))
+        except FileNotFoundError:
+            return 0
+
+    def expire(self: Spool) -> List[Offer]:
+        now = time.monotonic()
+        with self.__lock:
+            expired = [
+                o for o in self.__offers.values() if now - o.created > self.__ttl
+            ]
+            for o in expired:
+                del self.__offers[o.id]
+        for o in expired:
+            try:
+                os.unlink(self.path(o.id))
+            except FileNotFoundError:
+                pass
+        return expired
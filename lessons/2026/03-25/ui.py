@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import sys
+import time
 from threading import Thread
 
+from client import Client
 from logger import Log
 from prompt_toolkit import HTML
 from prompt_toolkit.application import Application
@@ -12,18 +14,30 @@ from prompt_toolkit.layout.layout import Layout
 from prompt_toolkit.output.color_depth import ColorDepth
 from prompt_toolkit.styles import Style
 from prompt_toolkit.widgets import SearchToolbar, TextArea
-from socket_extended import SocketExtended
+from scrollback import DEFAULT_FPS, DEFAULT_SCROLLBACK, Scrollback
+from socket_extended import FrameError, FrameType
 
 
 class UI:
     help_text = """
 YACR (Yet Another Chat Room)
 Type \"end\" to terminate.
+Type \"/join room\", \"/leave room\" or \"/room [room]\" to manage rooms,
+\"@name text\" to send a direct message and \"/history [room] [n]\"
+to see the messages after number n.
+Type \"/send name file\" to offer a file and \"/accept id\" to download one.
 """
 
-    def __init__(self: UI, socket: SocketExtended, log: Log, name: str) -> None:
+    def __init__(
+        self: UI,
+        socket: Client,
+        log: Log,
+        name: str,
+        scrollback: int = DEFAULT_SCROLLBACK,
+    ) -> None:
         self.__log = log
-        self.__socket: SocketExtended = socket
+        self.__scrollback: Scrollback = Scrollback(UI.help_text, scrollback)
+        self.__socket: Client = socket
         self.__name: str = name
         self.__output_field: TextArea = TextArea(
             style="class:output-field", text=UI.help_text
@@ -62,27 +76,61 @@ Type \"end\" to terminate.
         t: Thread = Thread(target=self.__write)
         t.daemon = True
         t.start()
+        r: Thread = Thread(target=self.__render)
+        r.daemon = True
+        r.start()
         self.__app.run()
 
     def __accept(self: UI, _: any) -> None:
         msg: str = self.__input_field.text
         try:
-            self.__socket.send(msg.encode())
             if msg == "end":
+                self.__socket.send_frame(FrameType.END)
                 sys.exit(0)
+            command, _, arg = msg.partition(" ")
+            if command == "/send":
+                to, _, path = arg.strip().partition(" ")
+                self.__offer(to, path.strip())
+                return
+            if command == "/accept":
+                self.__socket.accept(arg.strip(), self.__scrollback.append)
+                return
+            self.__socket.send_frame(FrameType.MESSAGE, msg.encode())
         except BrokenPipeError:
             sys.exit(0)
 
+    def __offer(self: UI, to: str, path: str) -> None:
+        try:
+            self.__socket.offer(to, path)
+            self.__scrollback.append(f"Offering {path} to {to}")
+        except OSError as os_err:
+            self.__scrollback.append(f"Cannot send {path}: {os_err.strerror}")
+
     def __write(self: UI) -> None:
-        msg: str = None
-        while msg != "":
+        frame = ()
+        while frame is not None:
             try:
-                msg = self.__socket.recv(200).decode()
-                new_text = self.__output_field.text + "\n" + msg
-                self.__output_field.buffer.document = Document(
-                    text=new_text, cursor_position=len(new_text)
-                )
-            except OSError as os_err:
+                frame = self.__socket.recv_frame()
+                if frame is not None and frame[0] == FrameType.PING:
+                    self.__socket.send_frame(FrameType.PONG)
+                if frame is not None and frame[0] == FrameType.OFFER:
+                    self.__socket.offered(frame[1], self.__scrollback.append)
+                if frame is None or frame[0] != FrameType.MESSAGE:
+                    continue
+                self.__scrollback.append(frame[1].decode())
+            except (FrameError, OSError) as os_err:
                 self.__log.exception(
                     "Error during reception of messages from server", error=os_err
                 )
+
+    def __render(self: UI) -> None:
+        # one repaint per frame, however many messages arrived in between
+        while True:
+            time.sleep(1 / DEFAULT_FPS)
+            text = self.__scrollback.render()
+            if text is None:
+                continue
+            self.__output_field.buffer.document = Document(
+                text=text, cursor_position=len(text)
+            )
+            self.__app.invalidate()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from typing import Tuple
+
+import click
+from codec import CODECS, Envelope, available
+
+
+def envelope(size: int) -> Envelope:
+    return {
+        "name": "Alice",
+        "type": ">",
+        "message": "x" * size,
+        "time": int(datetime.now().timestamp() * 1000),
+    }
+
+
+def run(codec: str, e: Envelope, rounds: int) -> Tuple[float, float, int]:
+    _, encoder, decoder = CODECS[codec]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        data = encoder(e)
+    encoded = time.perf_counter()
+    for _ in range(rounds):
+        decoder(data)
+    decoded = time.perf_counter()
+    # +1: the tag byte sent in front of every payload
+    return (
+        (encoded - start) / rounds * 1e9,
+        (decoded - encoded) / rounds * 1e9,
+        len(data) + 1,
+    )
+
+
+@click.command()
+@click.option(
+    "-s",
+    "--sizes",
+    help="Comma separated list of message sizes (characters)",
+    default="16,256,4096",
+    show_default=True,
+)
+@click.option(
+    "-r", "--rounds", help="Encodings per measure", default=100_000, show_default=True
+)
+def main(sizes: str, rounds: int) -> None:
+    print(f"{'codec':<8} {'size':>6} {'encode ns':>10} {'decode ns':>10} {'bytes':>7}")
+    for size in [int(s) for s in sizes.split(",")]:
+        e = envelope(size)
+        for codec in available():
+            enc, dec, n = run(codec, e, rounds)
+            print(f"{codec:<8} {size:>6} {enc:>10.0f} {dec:>10.0f} {n:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,10 @@ from __future__ import annotations
 from typing import Dict
 
 import yaml
+from codec import DEFAULT_CODEC
 from logger import Log
+from scrollback import DEFAULT_SCROLLBACK
+from streams import DEFAULT_STREAM_MAXLEN, DEFAULT_TRANSPORT
 
 
 class Config:
@@ -49,3 +52,43 @@ class Config:
         if o is not None:
             return o
         self.__log.exception("Name not found in the configuration file/command line options", terminate=True)
+
+    @property
+    def scrollback(self: Config) -> int:
+        o = self.__config.get("scrollback", None)
+        if o is not None:
+            return o
+        o = self.__data.get("scrollback", None)
+        if o is not None:
+            return o
+        return DEFAULT_SCROLLBACK
+
+    @property
+    def codec(self: Config) -> str:
+        o = self.__config.get("codec", None)
+        if o is not None:
+            return o
+        o = self.__data.get("codec", None)
+        if o is not None:
+            return o
+        return DEFAULT_CODEC
+
+    @property
+    def transport(self: Config) -> str:
+        o = self.__config.get("transport", None)
+        if o is not None:
+            return o
+        o = self.__data.get("transport", None)
+        if o is not None:
+            return o
+        return DEFAULT_TRANSPORT
+
+    @property
+    def stream_maxlen(self: Config) -> int:
+        o = self.__config.get("stream_maxlen", None)
+        if o is not None:
+            return o
+        o = self.__data.get("stream_maxlen", None)
+        if o is not None:
+            return o
+        return DEFAULT_STREAM_MAXLEN
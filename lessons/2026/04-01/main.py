@@ -1,6 +1,7 @@
 import click
 from config import Config
 from logger import Log
+from streams import TRANSPORTS
 from ui import UI
 
 
@@ -13,13 +14,41 @@ from ui import UI
 @click.option("-n", "--name", help="Your name in the chat", type=str)
 @click.option("-s", "--host", help="Hostname (or IP) of the Chat Room Server", type=str)
 @click.option("-p", "--port", help="TCP port of the Chat Room Server", type=int)
-def main(config: str, name: str, host: str, port: int) -> None:
+@click.option("--scrollback", help="Lines kept in the chat window", type=int)
+@click.option(
+    "--codec",
+    help="Encoding of the messages published",
+    type=click.Choice(["binary", "msgpack", "json"]),
+)
+@click.option(
+    "--transport",
+    help="Redis pub/sub (fire-and-forget) or Streams (history, catch-up)",
+    type=click.Choice(TRANSPORTS),
+)
+@click.option("--stream-maxlen", help="Entries kept in each stream", type=int)
+def main(
+    config: str,
+    name: str,
+    host: str,
+    port: int,
+    scrollback: int,
+    codec: str,
+    transport: str,
+    stream_maxlen: int,
+) -> None:
     log: Log = Log(filename="log/yacr-redis.log")
 
     cfg: Config = Config(
         log=log,
         path=config,
-        data={"name": name, "server": {"host": host, "port": port}},
+        data={
+            "name": name,
+            "scrollback": scrollback,
+            "codec": codec,
+            "transport": transport,
+            "stream_maxlen": stream_maxlen,
+            "server": {"host": host, "port": port},
+        },
     )
 
     ui: UI = UI(log=log, config=cfg)
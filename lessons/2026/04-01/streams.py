@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from typing import Iterator, List, Optional, Tuple
+
+# pubsub: fire-and-forget; streams: capped history, read from the last ID seen
+TRANSPORTS: List[str] = ["pubsub", "streams"]
+DEFAULT_TRANSPORT: str = "pubsub"
+# entries kept in each stream (approximately, XADD MAXLEN ~)
+DEFAULT_STREAM_MAXLEN: int = 10_000
+# entries of each stream fetched by one XREAD
+READ_COUNT: int = 1000
+# field of the entries holding the encoded envelope
+FIELD: str = "data"
+
+
+def seen_key(name: str) -> str:
+    # hash of the last ID read by a client in each stream
+    return f"yacr-seen-{name.lower()}"
+
+
+def entries(response: any) -> Iterator[Tuple[str, str, Optional[bytes]]]:
+    # (stream, id, payload) of an XREAD reply: a list with RESP2, a map with RESP3;
+    # payload is None for an entry written by someone else
+    if isinstance(response, dict):
+        response = [(stream, items[0]) for stream, items in response.items()]
+    for stream, items in response or []:
+        for id, fields in items:
+            yield stream.decode(), id.decode(), (fields or {}).get(FIELD.encode())
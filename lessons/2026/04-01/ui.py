@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-import json
+import random
 import sys
+import time
 from datetime import datetime
+from queue import SimpleQueue
+from struct import error as StructError
 from threading import Thread
 
+import codec
 import redis
 from config import Config
 from logger import Log
@@ -15,6 +19,14 @@ from prompt_toolkit.layout.layout import Layout
 from prompt_toolkit.output.color_depth import ColorDepth
 from prompt_toolkit.styles import Style
 from prompt_toolkit.widgets import SearchToolbar, TextArea
+from scrollback import DEFAULT_FPS, Scrollback
+from streams import FIELD, READ_COUNT, entries, seen_key
+
+# seconds of silence before the subscriber pings Redis to check the connection
+HEALTH_CHECK_INTERVAL: float = 10
+# backoff between attempts to subscribe again, with jitter against storms
+RECONNECT_DELAY: float = 0.5
+MAX_RECONNECT_DELAY: float = 30
 
 
 class UI:
@@ -26,6 +38,7 @@ Type \"end\" to terminate.
     def __init__(self: UI, log: Log, config: Config) -> None:
         self.__log = log
         self.__config = config
+        self.__scrollback: Scrollback = Scrollback(UI.help_text, config.scrollback)
         self.__output_field: TextArea = TextArea(
             style="class:output-field", text=UI.help_text
         )
@@ -59,20 +72,33 @@ Type \"end\" to terminate.
             full_screen=True,
         )
         log.info(self.__config.port)
+        self.__codec: str = codec.select(self.__config.codec)
+        if self.__codec != self.__config.codec:
+            log.warning(f"Codec {self.__config.codec} not available, using {self.__codec}")
+        # payloads are bytes: the first one tags the codec of the envelope
         self.__redis = redis.StrictRedis(
             self.__config.host,
             self.__config.port,
-            decode_responses=True,
+            health_check_interval=HEALTH_CHECK_INTERVAL,
+            socket_keepalive=True,
         )
+        # payloads read by the subscriber, decoded and shown by another thread
+        self.__messages: SimpleQueue = SimpleQueue()
+        self.__streams: bool = self.__config.transport == "streams"
         self.__publish(type="!", message="joins the chat")
 
     def run(self: UI) -> None:
-        t: Thread = Thread(target=self.__write, kwargs={"private": False})
+        t: Thread = Thread(
+            target=self.__tail if self.__streams else self.__subscribe
+        )
         t.daemon = True
         t.start()
-        t_private: Thread = Thread(target=self.__write, kwargs={"private": True})
-        t_private.daemon = True
-        t_private.start()
+        t_write: Thread = Thread(target=self.__write)
+        t_write.daemon = True
+        t_write.start()
+        t_render: Thread = Thread(target=self.__render)
+        t_render.daemon = True
+        t_render.start()
         self.__app.run()
 
     def __publish(self: UI, type: str, message: str) -> None:
@@ -88,16 +114,18 @@ Type \"end\" to terminate.
                 else:
                     topic = ["yacr"]
                     type = [type]
+                now = int(datetime.now().timestamp() * 1000)
                 for i, tp in enumerate(topic):
-                    self.__redis.publish(
+                    self.__send(
                         tp,
-                        json.dumps(
+                        codec.encode(
+                            self.__codec,
                             dict(
                                 name=self.__config.name,
                                 type=type[i],
                                 message=message,
-                                time=str(datetime.now()),
-                            )
+                                time=now,
+                            ),
                         ),
                     )
         except ConnectionError as conn_err:
@@ -106,6 +134,18 @@ Type \"end\" to terminate.
                 conn_err,
             )
 
+    def __send(self: UI, topic: str, payload: bytes) -> None:
+        if self.__streams:
+            # ~: Redis trims whole nodes of the stream, much cheaper than exactly
+            self.__redis.xadd(
+                topic,
+                {FIELD: payload},
+                maxlen=self.__config.stream_maxlen,
+                approximate=True,
+            )
+        else:
+            self.__redis.publish(topic, payload)
+
     def __accept(self, _: any) -> None:
         if self.__input_field.text.lower().strip() == "end":
             self.__publish(type="!", message="leaves the chat")
@@ -113,26 +153,97 @@ Type \"end\" to terminate.
         else:
             self.__publish(type=">", message=self.__input_field.text)
 
-    def __write(self: UI, private: bool) -> None:
+    def __subscribe(self: UI) -> None:
+        # one connection for the public and the private channel
+        channels = ["yacr", f"yacr-{self.__config.name.lower()}"]
+        delay = RECONNECT_DELAY
         while True:
+            sub = self.__redis.pubsub(ignore_subscribe_messages=True)
             try:
-                sub = self.__redis.pubsub()
-                if private:
-                    sub.subscribe(f"yacr-{self.__config.name.lower()}")
-                else:
-                    sub.subscribe("yacr")
-            except redis.exceptions.ConnectionError as conn_err:
-                self.__log.exception(
-                    f"Connection error with pubsub system located at {self.__config.host}:{self.__config.port}",
-                    conn_err,
+                sub.subscribe(*channels)
+                delay = RECONNECT_DELAY
+                while True:
+                    # the timeout lets the health check ping an idle connection
+                    message = sub.get_message(timeout=HEALTH_CHECK_INTERVAL)
+                    if message is not None:
+                        self.__messages.put(message["data"])
+            except (
+                redis.exceptions.ConnectionError,
+                redis.exceptions.TimeoutError,
+            ) as conn_err:
+                self.__log.warning(
+                    f"Connection lost with pubsub system located at {self.__config.host}:{self.__config.port}, "
+                    f"retrying in {delay:.1f}s: {conn_err}"
                 )
-            for message in sub.listen():
-                if message is not None and isinstance(message, dict):
-                    data = message.get("data")
-                    if isinstance(data, int):
-                        continue
-                    data = json.loads(data)
-                    new_text = f'{self.__output_field.text}\n{data["name"]} {data["type"]} {data["message"]} at {data["time"]}'
-                    self.__output_field.buffer.document = Document(
-                        text=new_text, cursor_position=len(new_text)
-                    )
+            finally:
+                sub.close()
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(2 * delay, MAX_RECONNECT_DELAY)
+
+    def __tail(self: UI) -> None:
+        # catches up from the last IDs seen by this client (saved in Redis, so
+        # they survive a restart) with a bulk read, then blocks for new entries
+        streams = ["yacr", f"yacr-{self.__config.name.lower()}"]
+        key = seen_key(self.__config.name)
+        ids = None
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                if ids is None:
+                    seen = self.__redis.hgetall(key)
+                    ids = {s: seen.get(s.encode(), b"0-0").decode() for s in streams}
+                block = None
+                while True:
+                    response = self.__redis.xread(ids, count=READ_COUNT, block=block)
+                    delay = RECONNECT_DELAY
+                    # caught up: wait for new entries, waking up for the health check
+                    block = int(HEALTH_CHECK_INTERVAL * 1000)
+                    last, read = {}, 0
+                    for stream, id, payload in entries(response):
+                        if payload is not None:
+                            self.__messages.put(payload)
+                        last[stream] = id
+                        read += 1
+                    if last:
+                        ids.update(last)
+                        self.__redis.hset(key, mapping=last)
+                    if read >= READ_COUNT:
+                        # a full batch: there may be more to catch up with
+                        block = None
+            except (
+                redis.exceptions.ConnectionError,
+                redis.exceptions.TimeoutError,
+            ) as conn_err:
+                self.__log.warning(
+                    f"Connection lost with the streams located at {self.__config.host}:{self.__config.port}, "
+                    f"retrying in {delay:.1f}s: {conn_err}"
+                )
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(2 * delay, MAX_RECONNECT_DELAY)
+
+    def __write(self: UI) -> None:
+        while True:
+            data = self.__messages.get()
+            if not isinstance(data, bytes):
+                continue
+            try:
+                data = codec.decode(data)
+                sent = datetime.fromtimestamp(data["time"] / 1000)
+                line = f'{data["name"]} {data["type"]} {data["message"]} at {sent}'
+            except (ValueError, StructError, KeyError, TypeError) as err:
+                # a malformed envelope must not stop the writer thread
+                self.__log.warning(f"Message dropped: {err}")
+                continue
+            self.__scrollback.append(line)
+
+    def __render(self: UI) -> None:
+        # one repaint per frame, however many messages arrived in between
+        while True:
+            time.sleep(1 / DEFAULT_FPS)
+            text = self.__scrollback.render()
+            if text is None:
+                continue
+            self.__output_field.buffer.document = Document(
+                text=text, cursor_position=len(text)
+            )
+            self.__app.invalidate()